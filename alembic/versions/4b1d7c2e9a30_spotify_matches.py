@@ -0,0 +1,35 @@
+"""Spotify matches
+
+Revision ID: 4b1d7c2e9a30
+Revises: 9e2456acbb92
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b1d7c2e9a30'
+down_revision: Union[str, None] = '9e2456acbb92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('spotify_matches',
+                    sa.Column('id', sa.String(), nullable=False),
+                    sa.Column('yt_id', sa.String(), nullable=True),
+                    sa.Column('title', sa.String(), nullable=True),
+                    sa.Column('duration', sa.Integer(), nullable=True),
+                    sa.Column('channel_name', sa.String(), nullable=True),
+                    sa.Column('channel_link', sa.String(), nullable=True),
+                    sa.Column('created_at', sa.Integer(), nullable=True),
+                    sa.PrimaryKeyConstraint('id')
+                    )
+
+
+def downgrade() -> None:
+    op.drop_table('spotify_matches')
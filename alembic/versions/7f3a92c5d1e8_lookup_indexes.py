@@ -0,0 +1,42 @@
+"""Lookup indexes
+
+Revision ID: 7f3a92c5d1e8
+Revises: 4b1d7c2e9a30
+Create Date: 2026-10-18 12:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f3a92c5d1e8'
+down_revision: Union[str, None] = '4b1d7c2e9a30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (index name, table, columns)
+INDEXES = [
+    ('ix_queue_guild_id_position', 'queue', ['guild_id', 'position']),
+    ('ix_now_playing_guild_id', 'now_playing', ['guild_id']),
+    ('ix_history_guild_id_position', 'history', ['guild_id', 'position']),
+    ('ix_search_list_guild_id_position', 'search_list', ['guild_id', 'position']),
+    ('ix_save_videos_guild_id_save_id', 'save_videos', ['guild_id', 'save_id']),
+    ('ix_save_videos_save_id_position', 'save_videos', ['save_id', 'position']),
+    ('ix_radio_info_name', 'radio_info', ['name']),
+    ('ix_saves_guild_id_position', 'saves', ['guild_id', 'position']),
+    ('ix_slowed_users_guild_id_user_id', 'slowed_users', ['guild_id', 'user_id']),
+    ('ix_tortured_users_guild_id_user_id', 'tortured_users', ['guild_id', 'user_id']),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade() -> None:
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
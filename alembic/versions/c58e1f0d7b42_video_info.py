@@ -0,0 +1,34 @@
+"""Video info
+
+Revision ID: c58e1f0d7b42
+Revises: 7f3a92c5d1e8
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c58e1f0d7b42'
+down_revision: Union[str, None] = '7f3a92c5d1e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('video_info',
+                    sa.Column('id', sa.String(), nullable=False),
+                    sa.Column('title', sa.String(), nullable=True),
+                    sa.Column('duration', sa.String(), nullable=True),
+                    sa.Column('channel_name', sa.String(), nullable=True),
+                    sa.Column('channel_link', sa.String(), nullable=True),
+                    sa.Column('updated_at', sa.Integer(), nullable=True),
+                    sa.PrimaryKeyConstraint('id')
+                    )
+
+
+def downgrade() -> None:
+    op.drop_table('video_info')
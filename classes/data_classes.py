@@ -206,6 +206,7 @@ class Save(Base):
     :type guild_id: int
     """
     __tablename__ = 'saves'
+    __table_args__ = (Index('ix_saves_guild_id_position', 'guild_id', 'position'),)
 
     id = Column(Integer, primary_key=True)
     position = Column(Integer)
@@ -233,6 +234,7 @@ class SlowedUser(Base):
     :type slowed_for: int
     """
     __tablename__ = 'slowed_users'
+    __table_args__ = (Index('ix_slowed_users_guild_id_user_id', 'guild_id', 'user_id'),)
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer)
@@ -254,6 +256,7 @@ class TorturedUser(Base):
     :type torture_delay: int
     """
     __tablename__ = 'tortured_users'
+    __table_args__ = (Index('ix_tortured_users_guild_id_user_id', 'guild_id', 'user_id'),)
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer)
@@ -264,3 +267,59 @@ class TorturedUser(Base):
         self.guild_id: int = guild_id
         self.user_id: int = user_id
         self.torture_delay: int = torture_delay
+
+class SpotifyMatch(Base):
+    """
+    Data class for caching youtube matches of spotify tracks
+    :type id: str - spotify track id
+    :type yt_id: str - youtube video id
+    :type title: str
+    :type duration: int
+    :type channel_name: str
+    :type channel_link: str
+    """
+    __tablename__ = 'spotify_matches'
+
+    id = Column(String, primary_key=True)
+    yt_id = Column(String)
+    title = Column(String)
+    duration = Column(Integer)
+    channel_name = Column(String)
+    channel_link = Column(String)
+    created_at = Column(Integer)
+
+    def __init__(self, spotify_id: str, yt_id: str, title: str, duration: int, channel_name: str, channel_link: str):
+        self.id: str = spotify_id
+        self.yt_id: str = yt_id
+        self.title: str = title
+        self.duration: int = duration
+        self.channel_name: str = channel_name
+        self.channel_link: str = channel_link
+        self.created_at: int = int(time())
+
+class VideoInfo(Base):
+    """
+    Data class for caching metadata of youtube videos
+    :type id: str - youtube video id
+    :type title: str
+    :type duration: str - seconds
+    :type channel_name: str
+    :type channel_link: str
+    :type updated_at: int
+    """
+    __tablename__ = 'video_info'
+
+    id = Column(String, primary_key=True)
+    title = Column(String)
+    duration = Column(String)
+    channel_name = Column(String)
+    channel_link = Column(String)
+    updated_at = Column(Integer)
+
+    def __init__(self, yt_id: str, title: str, duration: str, channel_name: str, channel_link: str):
+        self.id: str = yt_id
+        self.title: str = title
+        self.duration: str = duration
+        self.channel_name: str = channel_name
+        self.channel_link: str = channel_link
+        self.updated_at: int = int(time())
@@ -10,6 +10,8 @@ class DiscordGuild:
     :param glob: GlobalVars object
     :param guild_id: ID of the guild
     """
+    __slots__ = ('id', 'name', 'created_at', 'icon', 'member_count')
+
     def __init__(self, glob: GlobalVars, guild_id: int):
         guild_object = glob.bot.get_guild(guild_id)
 
@@ -33,6 +35,9 @@ class DiscordUser:
     :param glob: GlobalVars object
     :param user_id: ID of the user
     """
+    __slots__ = ('accent_color', 'color', 'avatar', 'display_avatar', 'default_avatar', 'banner', 'name', 'display_name',
+                 'global_name', 'id', 'discriminator', 'bot', 'system', 'created_at', 'mutual_guilds', 'badges')
+
     def __init__(self, glob: GlobalVars, user_id: int):
         user_object = glob.bot.get_user(user_id)
 
@@ -63,11 +68,8 @@ class DiscordUser:
             # timestamp
             self.created_at = user_object.created_at.timestamp()
 
-            # mutual guilds
-            guilds = []
-            for guild in user_object.mutual_guilds:
-                guilds.append(DiscordGuild(glob, guild.id))
-            self.mutual_guilds = guilds
+            # mutual guilds - only ids, DiscordGuild of every guild would be resolved and sent with each user
+            self.mutual_guilds = [guild.id for guild in user_object.mutual_guilds]
 
             # public flags
             self.badges = dict(iter(user_object.public_flags))
@@ -90,51 +92,59 @@ class DiscordUser:
             self.mutual_guilds = None
             self.badges = None
 
-class DiscordMember:
-    """
-    This class is used to store member information
-    :param glob: GlobalVars object
-    :param member_object: Member object
-    """
-    def __init__(self, glob: GlobalVars, member_object: discord.Member):
-        # id
-        self.id = member_object.id
-        self.discriminator = member_object.discriminator
-        self.bot = member_object.bot
+# field -> getter(glob, member_object), DiscordMember computes only the requested fields
+MEMBER_FIELDS = {
+    # id
+    'id': lambda glob, member: member.id,
+    'discriminator': lambda glob, member: member.discriminator,
+    'bot': lambda glob, member: member.bot,
 
-        # name
-        self.name = member_object.name  # username
-        self.nick = member_object.nick  # guild nickname
-        self.global_name = member_object.global_name  # global display name
-        self.display_name = member_object.display_name  # guild display name
+    # name
+    'name': lambda glob, member: member.name,  # username
+    'nick': lambda glob, member: member.nick,  # guild nickname
+    'global_name': lambda glob, member: member.global_name,  # global display name
+    'display_name': lambda glob, member: member.display_name,  # guild display name
 
-        # get url from Asset class else none
-        self.avatar = member_object.avatar.url if member_object.avatar else None
-        self.banner = member_object.banner.url if member_object.banner else None
+    # get url from Asset class else none
+    'avatar': lambda glob, member: member.avatar.url if member.avatar else None,
+    'banner': lambda glob, member: member.banner.url if member.banner else None,
 
-        # Color is a class, so we need to convert it to hex
-        self.color = member_object.color.__str__() if member_object.color else None
-        self.accent_color = member_object.accent_color.__str__() if member_object.accent_color else None
+    # Color is a class, so we need to convert it to hex
+    'color': lambda glob, member: member.color.__str__() if member.color else None,
+    'accent_color': lambda glob, member: member.accent_color.__str__() if member.accent_color else None,
 
-        # epoch time
-        self.created_at = member_object.created_at.timestamp()
-        self.joined_at = member_object.joined_at.timestamp()
+    # epoch time
+    'created_at': lambda glob, member: member.created_at.timestamp(),
+    'joined_at': lambda glob, member: member.joined_at.timestamp(),
 
-        # status as string
-        self.raw_status = member_object.raw_status
+    # status as string
+    'raw_status': lambda glob, member: member.raw_status,
 
-        # Badges
-        self.badges = dict(iter(member_object.public_flags))
+    # Badges
+    'badges': lambda glob, member: dict(iter(member.public_flags)),
 
-        # Guild icon
-        self.guild_icon = None
-        if member_object.guild:
-            self.guild_icon = member_object.guild.icon.url if member_object.guild.icon else None
+    # Guild icon
+    'guild_icon': lambda glob, member: member.guild.icon.url if member.guild and member.guild.icon else None,
 
-        # Roles
-        self.roles = []
-        for role in member_object.roles:
-            self.roles.append(DiscordRole(glob, role.id, member_object.guild.id, stripped=True))
+    # Roles - only ids, the roles themselves are in the role table of the guild (see guild_role_table)
+    'role_ids': lambda glob, member: [role.id for role in member.roles],
+}
+
+class DiscordMember:
+    """
+    This class is used to store member information
+    :param glob: GlobalVars object
+    :param member_object: Member object
+    :param fields: Fields to load (keys of MEMBER_FIELDS), None = all - the rest is None
+    """
+    __slots__ = tuple(MEMBER_FIELDS)
+
+    def __init__(self, glob: GlobalVars, member_object: discord.Member, fields=None):
+        for field, getter in MEMBER_FIELDS.items():
+            if fields is None or field in fields:
+                setattr(self, field, getter(glob, member_object))
+            else:
+                setattr(self, field, None)
 
 
 class DiscordChannel:
@@ -145,6 +155,8 @@ class DiscordChannel:
     :param no_members: Should members be loaded
     :param json_data: JSON data to load from
     """
+    __slots__ = ('id', 'name', 'created_at', 'members', 'member_count', 'html')
+
     def __init__(self, glob, channel_id: int, no_members=False, json_data=None):
         if json_data:
             self.id = json_data['id']
@@ -219,6 +231,8 @@ class DiscordRole:
     :param no_members: Should members be loaded
     :param stripped: Should the object be stripped
     """
+    __slots__ = ('id', 'name', 'created_at', 'color', 'permissions', 'members', 'member_count')
+
     def __init__(self, glob: GlobalVars, role_id: int, guild_id: int, no_members: bool=False, stripped: bool=False):
         role_object = glob.bot.get_guild(guild_id).get_role(role_id)
 
@@ -263,14 +277,16 @@ class DiscordInvite:
     :param glob: GlobalVars object
     :param invite_object: Invite object
     """
+    __slots__ = ('id', 'url', 'code', 'inviter', 'created_at', 'expires_at', 'temporary', 'approximate_member_count',
+                 'approximate_presence_count', 'max_age', 'max_uses', 'uses', 'revoked')
+
     def __init__(self, glob: GlobalVars, invite_object: discord.Invite):
         if invite_object:
             self.id = invite_object.id
             self.url = invite_object.url
             self.code = invite_object.code
 
-            if invite_object.inviter:
-                self.inviter = DiscordUser(glob, invite_object.inviter.id)
+            self.inviter = DiscordUser(glob, invite_object.inviter.id) if invite_object.inviter else None
 
             self.created_at = invite_object.created_at.strftime("%d/%m/%Y %H:%M:%S")
 
@@ -301,4 +317,15 @@ class DiscordInvite:
             self.max_age = None
             self.max_uses = None
             self.uses = None
-            self.revoked = None
\ No newline at end of file
+            self.revoked = None
+
+def guild_role_table(glob: GlobalVars, guild_id: int, role_ids) -> dict:
+    """
+    Returns stripped DiscordRole objects of the roles (each role once)
+    Members only reference the ids, so a list of members does not repeat the same role objects
+    :param glob: GlobalVars object
+    :param guild_id: ID of the guild
+    :param role_ids: iterable of role ids
+    :return: {role_id: DiscordRole, ...}
+    """
+    return {role_id: DiscordRole(glob, role_id, guild_id, stripped=True) for role_id in set(role_ids)}
@@ -9,14 +9,15 @@ from database.main import *
 
 from utils.convert import convert_duration
 from utils.global_vars import radio_dict
+import utils.video_info
 import utils.video_time
+import utils.radio
 import utils.save
 
 from sclib import Track
 from time import time
-from bs4 import BeautifulSoup
-import requests
 import youtubesearchpython
+import asyncio
 
 import config
 
@@ -35,6 +36,51 @@ def get_video_data(url: str) -> (dict, str) or (None, str):
 
     return video, 'ok'
 
+def video_data_fields(video: dict) -> dict:
+    """
+    Returns video class fields from youtube video info
+    :param video: dict - video info from get_video_data
+    :return: dict - title, picture, duration, channel_name, channel_link
+    """
+    return {'title': video['title'],
+            'picture': 'https://img.youtube.com/vi/' + video['id'] + '/default.jpg',
+            'duration': video['duration']['secondsText'],
+            'channel_name': video['channel']['name'],
+            'channel_link': video['channel']['link']}
+
+async def fetch_video_data(glob: GlobalVars, url: str) -> dict:
+    """
+    Async variant of get_video_data for the bot loop, the blocking youtube request runs in the default executor
+    Stored info (utils.video_info) is returned without a request
+    The result can be passed to a 'Video' class, so it does not request the info in __init__
+    :param glob: GlobalVars
+    :param url: str - youtube video url
+    :return: dict - title, picture, duration, channel_name, channel_link
+    :raises ValueError: when the info could not be fetched
+    """
+    fields = utils.video_info.video_info_store.get(glob, url)
+    if fields is not None:
+        return fields
+
+    video, msg = await asyncio.get_running_loop().run_in_executor(None, get_video_data, url)
+    if msg != 'ok':
+        raise ValueError(msg)
+
+    fields = video_data_fields(video)
+    utils.video_info.video_info_store.put(glob, url, fields)
+    return fields
+
+def in_event_loop() -> bool:
+    """
+    Returns whether the current thread is running an event loop (blocking calls would stop it)
+    :return: bool
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
 # Video Class Functions
 
 def video_class_init(self,
@@ -84,15 +130,23 @@ def video_class_init(self,
             raise ValueError("URL is required")
 
         if any(v is None for v in [title, picture, duration, channel_name, channel_link]):
-            video, msg = get_video_data(url)
-            if msg != 'ok':
-                raise ValueError(msg)
-
-            self.title = video['title']
-            self.picture = 'https://img.youtube.com/vi/' + video['id'] + '/default.jpg'
-            self.duration = video['duration']['secondsText']
-            self.channel_name = video['channel']['name']
-            self.channel_link = video['channel']['link']
+            fields = utils.video_info.video_info_store.get(glob, url)
+            if fields is None and in_event_loop():
+                # the youtube request would block the loop - callers on a loop pass the fields from fetch_video_data
+                if title is None:
+                    raise ValueError(f'Video info of {url} is not loaded (use fetch_video_data)')
+                # a copy of a known video keeps the fields it has
+                fields = {}
+            elif fields is None:
+                video, msg = get_video_data(url)
+                if msg != 'ok':
+                    raise ValueError(msg)
+
+                fields = video_data_fields(video)
+                utils.video_info.video_info_store.put(glob, url, fields)
+
+            for name, value in fields.items():
+                setattr(self, name, value)
 
     elif self.class_type == 'Radio':
         if radio_info is None:
@@ -157,13 +211,14 @@ def video_class_init(self,
 def video_class_renew(self, glob: GlobalVars, from_init: bool = False):
     if self.class_type == 'Radio':
         radio_info_class = glob.ses.query(RadioInfo).filter(RadioInfo.name == self.radio_info['name']).first()
-        if radio_info_class is None:
+        # the web process has a read-only session, the bot creates the row when it refreshes the station
+        if radio_info_class is None and glob.bot is not None:
             radio_info_class = RadioInfo(radio_id=radio_dict[self.radio_info['name']]['id'])
             glob.ses.add(radio_info_class)
             glob.ses.commit()
 
-        if int(time()) - radio_info_class.last_update > 10 or from_init:
-            radio_info_class.update()
+        # refreshed in the background, shared by all guilds playing the station
+        utils.radio.radio_refresher.watch(glob, self.radio_info['name'])
 
 def video_class_current_chapter(self, glob: GlobalVars):
     if self.played_duration is None:
@@ -213,6 +268,7 @@ class RadioInfo(Base):
     Data class for storing radio information
     """
     __tablename__ = 'radio_info'
+    __table_args__ = (Index('ix_radio_info_name', 'name'),)
 
     id = Column(Integer, primary_key=True)
     name = Column(String)
@@ -230,30 +286,6 @@ class RadioInfo(Base):
         self.name: str = [radio['name'] for radio in radio_dict.values() if radio['id'] == radio_id][0]
         self.last_update: int = int(time())
 
-    def update(self):
-        if self.website == 'radia_cz':
-            html = requests.get(self.url).text
-            soup = BeautifulSoup(html, features="lxml")
-            data1 = soup.find('div', attrs={'class': 'interpret-image'})
-            data2 = soup.find('div', attrs={'class': 'interpret-info'})
-            # if data1 is None or data2 is None:
-            #     return None
-
-            self.picture = data1.find('img')['src']
-            self.channel_name = data2.find('div', attrs={'class': 'nazev'}).text.lstrip().rstrip()
-            self.title = data2.find('div', attrs={'class': 'song'}).text.lstrip().rstrip()
-
-        elif self.website == 'actve':
-            r = requests.get(self.url).json()
-            self.picture = r['coverBase']
-            self.channel_name = r['artist']
-            self.title = r['title']
-
-        else:
-            raise ValueError("Invalid radio website")
-
-        self.last_update = int(time())
-
 # Video Classes
 
 # class VideoClass(Base):
@@ -337,6 +369,7 @@ class Queue(Base):
     Raises ValueError: If URL is not provided or is incorrect for class_type
     """
     __tablename__ = 'queue'
+    __table_args__ = (Index('ix_queue_guild_id_position', 'guild_id', 'position'),)
 
     id = Column(Integer, primary_key=True)
     position = Column(Integer)
@@ -412,6 +445,7 @@ class NowPlaying(Base):
     Raises ValueError: If URL is not provided or is incorrect for class_type
     """
     __tablename__ = 'now_playing'
+    __table_args__ = (Index('ix_now_playing_guild_id', 'guild_id'),)
 
     id = Column(Integer, primary_key=True)
     position = Column(Integer)
@@ -487,6 +521,7 @@ class History(Base):
     Raises ValueError: If URL is not provided or is incorrect for class_type
     """
     __tablename__ = 'history'
+    __table_args__ = (Index('ix_history_guild_id_position', 'guild_id', 'position'),)
 
     id = Column(Integer, primary_key=True)
     position = Column(Integer)
@@ -562,6 +597,7 @@ class SearchList(Base):
     Raises ValueError: If URL is not provided or is incorrect for class_type
     """
     __tablename__ = 'search_list'
+    __table_args__ = (Index('ix_search_list_guild_id_position', 'guild_id', 'position'),)
 
     id = Column(Integer, primary_key=True)
     position = Column(Integer)
@@ -637,6 +673,8 @@ class SaveVideo(Base):
     Raises ValueError: If URL is not provided or is incorrect for class_type
     """
     __tablename__ = 'save_videos'
+    __table_args__ = (Index('ix_save_videos_guild_id_save_id', 'guild_id', 'save_id'),
+                      Index('ix_save_videos_save_id_position', 'save_id', 'position'))
 
     save_id = Column(Integer, ForeignKey('saves.id'))
 
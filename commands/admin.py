@@ -11,7 +11,7 @@ from utils.checks import is_float
 from utils.convert import to_bool
 from utils.global_vars import languages_dict
 
-from database.guild import guild, is_user_tortured, delete_tortured_user
+from database.guild import guild, is_user_tortured, delete_tortured_user, slowed_user_index
 
 from commands.utils import ctx_check
 
@@ -229,6 +229,7 @@ async def slowed_users_add_command_def(ctx: dc_commands.Context, glob: GlobalVar
     with glob.ses.no_autoflush:
         glob.ses.add(slowed_user)
         glob.ses.commit()
+    slowed_user_index.add(guild_id, member.id, slowed_for)
 
     message = f"{tg(guild_id, 'Added slowed user:')} <@{member.id}> -> {slowed_for}"
     await ctx.reply(message, ephemeral=ephemeral)
@@ -259,6 +260,8 @@ async def slowed_users_add_all_command_def(ctx: dc_commands.Context, glob: Globa
     with glob.ses.no_autoflush:
         glob.ses.add_all(slowed_users)
         glob.ses.commit()
+    for slowed_user in slowed_users:
+        slowed_user_index.add(slowed_user.guild_id, slowed_user.user_id, slowed_for)
 
     message = f"{tg(guild_id, 'Added slowed users:')} {len(slowed_users)}"
     await ctx.reply(message, ephemeral=ephemeral)
@@ -275,16 +278,17 @@ async def slowed_users_remove_command_def(ctx: dc_commands.Context, glob: Global
     log(ctx, 'slowed_users_remove', [member.id], log_type='function', author=ctx.author)
     guild_id = ctx.guild.id
 
-    slowed_user = glob.ses.query(SlowedUser).filter_by(user_id=member.id, guild_id=guild_id).first()
-    if slowed_user is None:
+    # the user can be added more times, all rows are removed together with the index entry
+    with glob.ses.no_autoflush:
+        removed = glob.ses.query(SlowedUser).filter_by(user_id=member.id, guild_id=guild_id).delete()
+        glob.ses.commit()
+    slowed_user_index.remove(guild_id, member.id)
+
+    if not removed:
         message = tg(guild_id, "That user is not slowed!")
         await ctx.reply(message, ephemeral=ephemeral)
         return ReturnData(False, message)
 
-    with glob.ses.no_autoflush:
-        glob.ses.delete(slowed_user)
-        glob.ses.commit()
-
     message = f"{tg(guild_id, 'Removed slowed user:')} <@{member.id}>"
     await ctx.reply(message, ephemeral=ephemeral)
     return ReturnData(True, message)
@@ -310,6 +314,7 @@ async def slowed_users_remove_all_command_def(ctx: dc_commands.Context, glob: Gl
         for slowed_user in slowed_users:
             glob.ses.delete(slowed_user)
         glob.ses.commit()
+    slowed_user_index.remove_guild(guild_obj.id)
 
     message = f"{tg(guild_id, 'Removed slowed users:')} {len(slowed_users)}"
     await ctx.reply(message, ephemeral=ephemeral)
@@ -5,6 +5,7 @@ from classes.data_classes import ReturnData
 import classes.view
 
 from utils.source import GetSource
+from utils.prefetch import prefetcher
 from utils.log import log
 from utils.translate import tg
 from utils.save import save_json, push_update
@@ -143,6 +144,9 @@ async def play_def(ctx, glob: GlobalVars, url=None, force=False, mute_response=F
         glob.ses.commit()
 
     try:
+        # wait for the prefetched stream (if it is this video) -> create_source takes it from cache
+        await prefetcher.take(guild_id, video)
+
         source, chapters = await GetSource.create_source(glob, guild_id, video.url, source_type=video.class_type, video_class=video)
         voice.play(source, after=lambda e: asyncio.run_coroutine_threadsafe(play_def(ctx, glob, after=True), glob.bot.loop))
 
@@ -1,17 +1,20 @@
 from utils.global_vars import GlobalVars
 
 from classes.data_classes import ReturnData
-from classes.video_class import to_search_list_class, Queue, SearchList
+from classes.video_class import to_search_list_class, Queue, SearchList, fetch_video_data
 import classes.view
 
 from utils.log import log
 from utils.translate import tg
-from utils.url import get_url_type, extract_yt_id
+from utils.url import classify_url
 from utils.cli import get_url_probe_data
-from utils.discord import to_queue, create_embed
+from utils.discord import to_queue, to_queue_bulk, create_embed
 from utils.spotify import spotify_album_to_yt_video_list, spotify_playlist_to_yt_video_list, spotify_to_yt_video
 from utils.save import save_json, push_update
-from utils.convert import convert_duration
+from utils.prefetch import prefetcher
+from utils.source import extraction_pool
+from utils.convert import convert_duration, duration_to_seconds
+from utils.video_info import video_info_store
 
 from database.guild import guild, clear_queue
 
@@ -65,8 +68,8 @@ async def queue_command_def(ctx,
         return ReturnData(False, message)
 
     # Get url type
-    url_type, url = get_url_type(url)
-    yt_id = extract_yt_id(url)
+    url_info = classify_url(url)
+    url_type, url, yt_id = url_info.url_type, url_info.url, url_info.yt_id
 
     if url_type in ['Spotify Playlist', 'Spotify Album', 'Spotify Track', 'Spotify URL']:
         if not glob.sp:
@@ -84,43 +87,68 @@ async def queue_command_def(ctx,
 
     if url_type == 'YouTube Video' or yt_id is not None:
         url = f"https://www.youtube.com/watch?v={yt_id}"
-        video = Queue(glob, 'Video', author_id, guild_id, url=url)
+        try:
+            video_data = await fetch_video_data(glob, url)
+        except ValueError as e:
+            if not mute_response:
+                await ctx.reply(e, ephemeral=ephemeral)
+            return ReturnData(False, f"{e}")
+        video = Queue(glob, 'Video', author_id, guild_id, url=url, **video_data)
         message = to_queue(glob, guild_id, video, position=position, copy_video=False)
         if not mute_response:
             await ctx.reply(message, ephemeral=ephemeral)
         return ReturnData(True, message, video)
 
     if url_type == 'YouTube Playlist':
+        adding_message = None
         if is_ctx:
-            if not ctx.interaction.response.is_done():
+            if not mute_response:
+                adding_message = await ctx.reply(tg(guild_id, 'Adding songs to queue... (might take a while)'),
+                                                 ephemeral=ephemeral)
+            elif not ctx.interaction.response.is_done():
                 await ctx.defer(ephemeral=ephemeral)
 
+        loop = asyncio.get_event_loop()
         try:
-            playlist_videos: list = youtubesearchpython.Playlist.getVideos(url)['videos']
+            playlist = await loop.run_in_executor(None, youtubesearchpython.Playlist, url)
         except KeyError:
+            playlist = None
+
+        if playlist is None or playlist.videos is None:
             message = f'This playlist is not viewable: `{url}`'
-            if not mute_response:
+            if adding_message:
+                await adding_message.edit(content=message)
+            elif not mute_response:
                 await ctx.reply(message, ephemeral=ephemeral)
             return ReturnData(False, message)
 
-        if playlist_videos is None:
-            message = f'An error occurred while getting the playlist: `{url}`'
-            if not mute_response:
-                await ctx.reply(message, ephemeral=ephemeral)
-            return ReturnData(False, message)
+        # fetch all pages first, then add the whole playlist in one transaction
+        while playlist.hasMoreVideos:
+            if adding_message:
+                await adding_message.edit(content=f"{tg(guild_id, 'Adding songs to queue... (might take a while)')} `{len(playlist.videos)}`")
+            await loop.run_in_executor(None, playlist.getNextVideos)
 
-        if position is not None:
-            playlist_videos = list(reversed(playlist_videos))
+        # the videos already contain all the metadata
+        videos = []
+        for val in playlist.videos:
+            try:
+                video_url = f"https://www.youtube.com/watch?v={val['id']}"
+                fields = search_result_fields(val)
+                if fields is None:
+                    # live streams have no duration in the playlist payload
+                    fields = await fetch_video_data(glob, video_url)
+                videos.append(Queue(glob, 'Video', author_id, guild_id, url=video_url, **fields))
+            except (ValueError, KeyError, TypeError):
+                continue
 
-        for index, val in enumerate(playlist_videos):
-            url = f"https://www.youtube.com/watch?v={playlist_videos[index]['id']}"
-            video = Queue(glob, 'Video', author_id, guild_id, url=url)
-            to_queue(glob, guild_id, video, position=position, copy_video=False, no_push=True)
+        added = to_queue_bulk(glob, guild_id, videos, position=position)
 
         push_update(glob, guild_id)
 
-        message = f"`{len(playlist_videos)}` {tg(guild_id, 'songs from playlist added to queue!')} -> [Control Panel]({config.WEB_URL}/guild/{guild_id}&key={db_guild.data.key})"
-        if not mute_response:
+        message = f"`{added}` {tg(guild_id, 'songs from playlist added to queue!')} -> [Control Panel]({config.WEB_URL}/guild/{guild_id}&key={db_guild.data.key})"
+        if adding_message:
+            await adding_message.edit(content=message)
+        elif not mute_response:
             await ctx.reply(message, ephemeral=ephemeral)
         return ReturnData(True, message)
 
@@ -133,15 +161,17 @@ async def queue_command_def(ctx,
                                              ephemeral=ephemeral)
 
         if url_type == 'Spotify Playlist':
-            video_list = spotify_playlist_to_yt_video_list(glob, url, author_id, guild_id)
+            video_list = await spotify_playlist_to_yt_video_list(glob, url, author_id, guild_id)
         else:
-            video_list = spotify_album_to_yt_video_list(glob, url, author_id, guild_id)
+            video_list = await spotify_album_to_yt_video_list(glob, url, author_id, guild_id)
 
-        if position is not None:
-            video_list = list(reversed(video_list))
+        if video_list is None:
+            message = f'{tg(guild_id, "Invalid spotify url")}: `{url}`'
+            if is_ctx and adding_message:
+                await adding_message.edit(content=message)
+            return ReturnData(False, message)
 
-        for video in video_list:
-            to_queue(glob, guild_id, video, position=position, copy_video=False, no_push=True)
+        to_queue_bulk(glob, guild_id, video_list, position=position)
         push_update(glob, guild_id)
 
         message = f'`{len(video_list)}` {tg(guild_id, "songs from playlist added to queue!")} -> [Control Panel]({config.WEB_URL}/guild/{guild_id}&key={db_guild.data.key})'
@@ -150,7 +180,7 @@ async def queue_command_def(ctx,
         return ReturnData(True, message)
 
     if url_type in ['Spotify Track', 'Spotify URL']:
-        video = spotify_to_yt_video(glob, url, author_id, guild_id)
+        video = await spotify_to_yt_video(glob, url, author_id, guild_id)
         if video is None:
             message = f'{tg(guild_id, "Invalid spotify url")}: `{url}`'
             if not mute_response:
@@ -275,6 +305,7 @@ async def skip_def(ctx, glob: GlobalVars) -> ReturnData:
 
     if guild_object.voice_client:
         if guild_object.voice_client.is_playing():
+            extraction_pool.cancel(guild_id)
             stop_response = await commands.voice.stop_def(ctx, glob, mute_response=True, keep_loop=True)
             if not stop_response.response:
                 return stop_response
@@ -335,6 +366,7 @@ async def remove_def(ctx, glob: GlobalVars, number: int, display_type: Literal['
 
             push_update(glob, guild_id)
             save_json(glob)
+            prefetcher.refresh(glob, guild_id)
 
             return ReturnData(True, message)
 
@@ -390,6 +422,7 @@ async def clear_def(ctx, glob: GlobalVars, ephemeral: bool = False) -> ReturnDat
     queue_count = clear_queue(glob, guild_id)
     push_update(glob, guild_id)
     save_json(glob)
+    prefetcher.refresh(glob, guild_id)
 
     message = tg(guild_id, 'Removed **all** songs from queue') + ' -> ' + f'`{queue_count}` songs removed'
     await ctx.reply(message, ephemeral=ephemeral)
@@ -418,6 +451,7 @@ async def shuffle_def(ctx, glob: GlobalVars, ephemeral: bool = False) -> ReturnD
     glob.ses.commit()
     push_update(glob, guild_id)
     save_json(glob)
+    prefetcher.refresh(glob, guild_id)
 
     message = tg(guild_id, 'Songs in queue shuffled')
     await ctx.reply(message, ephemeral=ephemeral)
@@ -520,6 +554,22 @@ async def show_def(ctx, glob: GlobalVars, display_type: Literal['short', 'medium
 
     save_json(glob)
 
+def search_result_fields(result: dict) -> dict or None:
+    """
+    Returns video class fields from a VideosSearch result
+    :param result: dict - one item of VideosSearch(...).result()['result']
+    :return: dict - title, picture, duration, channel_name, channel_link or None if the result has no duration
+    """
+    duration = duration_to_seconds(result.get('duration'))
+    if duration is None:
+        return None
+
+    return {'title': result['title'],
+            'picture': f"https://img.youtube.com/vi/{result['id']}/default.jpg",
+            'duration': str(duration),
+            'channel_name': result['channel']['name'],
+            'channel_link': result['channel']['link']}
+
 async def search_command_def(ctx, glob: GlobalVars, search_query, display_type: Literal['short', 'long'] = None,
                              force: bool = False, from_play: bool = False, ephemeral: bool = False) -> ReturnData:
     """
@@ -555,31 +605,48 @@ async def search_command_def(ctx, glob: GlobalVars, search_query, display_type:
     if display_type == 'long':
         await ctx.reply(tg(guild_id, 'Searching...'), ephemeral=ephemeral)
 
-    custom_search = youtubesearchpython.VideosSearch(search_query, limit=5)
+    loop = asyncio.get_event_loop()
+    search = await loop.run_in_executor(None, lambda: youtubesearchpython.VideosSearch(search_query, limit=5).result())
+    results = search['result'][:5]
+
     with glob.ses.no_autoflush:
         glob.ses.query(SearchList).filter_by(guild_id=guild_id).delete()
         glob.ses.commit()
 
     view = classes.view.SearchOptionView(ctx, glob, force, from_play)
 
-    if not custom_search.result()['result']:
+    if not results:
         message = tg(guild_id, 'No results found!')
         await ctx.reply(message, ephemeral=ephemeral)
         return ReturnData(False, message)
 
-    for i in range(5):
-        # noinspection PyTypeChecker
-        url = custom_search.result()['result'][i]['link']
-        video = Queue(glob, 'Video', ctx.author.id, guild_id, url=url)
-        db_guild.search_list.append(to_search_list_class(glob, video))
-        glob.ses.commit()
+    async def result_fields(result: dict) -> dict or None:
+        fields = search_result_fields(result)
+        if fields is not None:
+            video_info_store.put(glob, result['link'], fields)
+            return fields
+        # live streams have no duration in the search payload
+        try:
+            return await fetch_video_data(glob, result['link'])
+        except ValueError as e:
+            log(guild_id, f'Search result info failed: {result["link"]} -> {e}', log_type='error')
+            return None
 
-        if display_type == 'long':
+    fields_list = await asyncio.gather(*[result_fields(result) for result in results])
+    videos = [Queue(glob, 'Video', ctx.author.id, guild_id, url=result['link'], **fields)
+              for result, fields in zip(results, fields_list) if fields is not None]
+
+    db_guild.search_list.extend([to_search_list_class(glob, video) for video in videos])
+    glob.ses.commit()
+
+    if display_type == 'long':
+        # the results are already fetched, the embeds are sent in order
+        for i, video in enumerate(videos):
             embed = create_embed(glob, video, f'{tg(guild_id, "Result #")}{i + 1}', guild_id)
             await ctx.message.channel.send(embed=embed, ephemeral=ephemeral)
-        if display_type == 'short':
-            message += f'{tg(guild_id, "Result #")}{i + 1} : [`{video.title}`](<{video.url}>)\n'
     if display_type == 'short':
+        for i, video in enumerate(videos):
+            message += f'{tg(guild_id, "Result #")}{i + 1} : [`{video.title}`](<{video.url}>)\n'
         await ctx.reply(message, view=view, ephemeral=ephemeral)
 
     save_json(glob)
@@ -7,6 +7,8 @@ from utils.translate import tg
 from utils.save import save_json, push_update
 from utils.discord import now_to_history, get_voice_client
 from utils.video_time import set_stopped, set_resumed
+from utils.source import extraction_pool
+from utils.prefetch import prefetcher
 
 from database.guild import guild, clear_queue
 from commands.utils import ctx_check
@@ -231,6 +233,8 @@ async def disconnect_def(ctx, glob: GlobalVars, mute_response: bool = False) ->
     is_ctx, guild_id, author_id, guild_object = ctx_check(ctx, glob)
 
     if guild_object.voice_client:
+        prefetcher.cancel(guild_id)
+        extraction_pool.cancel(guild_id, prefetch=True)
         await stop_def(ctx, glob, mute_response=True)
         clear_queue(glob, guild_id)
 
@@ -4,16 +4,91 @@ import classes.data_classes as data_classes
 import classes.video_class as video_class
 from utils.global_vars import radio_dict
 from utils.convert import struct_to_time
+import utils.radio
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, selectinload
+from functools import lru_cache
+
+@lru_cache(maxsize=None)
+def guild_load_options() -> tuple:
+    """
+    Returns loader options of the relationships loaded together with the guild (one round trip per guild)
+    Built on first use - creating them configures the mappers, which fails while the model modules are still imported
+    :return: tuple
+    """
+    return (
+        joinedload(data_classes.Guild.options),
+        joinedload(data_classes.Guild.data),
+        joinedload(data_classes.Guild.now_playing),
+        selectinload(data_classes.Guild.queue),
+    )
+
+def _guild_cache(glob: GlobalVars) -> dict:
+    """
+    Returns the guild cache of the session (guild_id -> Guild object)
+    Keeps the guilds alive in the identity map of the session
+    :param glob: GlobalVars
+    :return: dict
+    """
+    return glob.ses.info.setdefault('guild_cache', {})
 
 def guild(glob: GlobalVars, guild_id: int):
     """
     Returns a guild object
+    Cached guilds are returned without a query, expired ones are reloaded with their relationships
     :param glob: GlobalVars
     :param guild_id: ID of the guild
     :return: Guild object
     """
+    guild_id = int(guild_id)
+    cache = _guild_cache(glob)
+    stale = glob.ses.info.setdefault('stale_guilds', set())
+
     with glob.ses.no_autoflush:
-        return glob.ses.query(data_classes.Guild).filter_by(id=int(guild_id)).first()
+        guild_object = cache.get(guild_id)
+        if guild_object is not None:
+            state = inspect(guild_object)
+            if state.session is glob.ses and not state.deleted and not state.was_deleted:
+                if not state.expired and guild_id not in stale:
+                    return guild_object
+                stale.discard(guild_id)
+                return glob.ses.get(data_classes.Guild, guild_id, options=guild_load_options(), populate_existing=True)
+            del cache[guild_id]
+
+        guild_object = glob.ses.get(data_classes.Guild, guild_id, options=guild_load_options())
+        if guild_object is not None:
+            cache[guild_id] = guild_object
+        return guild_object
+
+def expire_guild(glob: GlobalVars, guild_id: int):
+    """
+    Marks cached guild as changed by another process, next guild() call reloads it
+    :param glob: GlobalVars
+    :param guild_id: ID of the guild
+    :return: None
+    """
+    glob.ses.info.setdefault('stale_guilds', set()).add(int(guild_id))
+
+def expire_all_guilds(glob: GlobalVars):
+    """
+    Marks all cached guilds as changed by another process (updates could have been missed)
+    :param glob: GlobalVars
+    :return: None
+    """
+    glob.ses.info.setdefault('stale_guilds', set()).update(list(_guild_cache(glob).keys()))
+
+def invalidate_guild(glob: GlobalVars, guild_id: int = None):
+    """
+    Removes guild from the guild cache (all guilds if guild_id is None)
+    :param glob: GlobalVars
+    :param guild_id: ID of the guild
+    :return: None
+    """
+    if guild_id is None:
+        _guild_cache(glob).clear()
+    else:
+        _guild_cache(glob).pop(int(guild_id), None)
 
 def guilds(glob: GlobalVars):
     """
@@ -118,7 +193,8 @@ def guild_bar(glob: GlobalVars, guild_id: int) -> (int, int):
     :param guild_id: ID of the guild
     :return: (bar, max_bar)
     """
-    return guild(glob, guild_id).bar, guild(glob, guild_id).max_bar
+    guild_object = guild(glob, guild_id)
+    return guild_object.bar, guild_object.max_bar
 
 # Guild Save
 def guild_save_count(glob: GlobalVars, guild_id: int):
@@ -185,6 +261,8 @@ def delete_guild(glob: GlobalVars, guild_id: int):
     :param guild_id: ID of the guild
     :return: None
     """
+    invalidate_guild(glob, guild_id)
+
     with glob.ses.no_autoflush:
         glob.ses.query(data_classes.Guild).filter_by(id=guild_id).delete()
         glob.ses.query(data_classes.GuildData).filter_by(id=guild_id).delete()
@@ -223,30 +301,77 @@ def get_radio_info(glob: GlobalVars, radio_name: str):
     :return: Radio object
     """
     with glob.ses.no_autoflush:
-        radio_info_class = glob.ses.query(video_class.RadioInfo).filter_by(name=str(radio_name)).first()
+        query = glob.ses.query(video_class.RadioInfo).filter_by(name=str(radio_name))
+        if glob.bot is None:
+            # web process - the bot refreshes the row
+            query = query.populate_existing()
+        radio_info_class = query.first()
         if radio_info_class is None:
             radio_dictionary = radio_dict
             if radio_name not in radio_dictionary.keys():
                 raise ValueError("Radio name not found")
             radio_info_class = video_class.RadioInfo(radio_id=radio_dict[radio_name]['id'])
-            glob.ses.add(radio_info_class)
-            glob.ses.commit()
-        return radio_info_class
+            # the web process has a read-only session, the bot creates the row when it refreshes the station
+            if glob.bot is not None:
+                glob.ses.add(radio_info_class)
+                glob.ses.commit()
+
+    # keep the station refreshed while it is read
+    utils.radio.radio_refresher.watch(glob, str(radio_name))
+    return radio_info_class
 
 # Slowed Users
+class SlowedUserIndex:
+    """
+    In-memory index of slowed users - (guild_id, user_id) -> slowed_for
+
+    Checked on every message, so it has to be without database access
+    Loaded from the database on first use, kept in sync by the slowed users commands
+    """
+    def __init__(self):
+        self._index = {}
+        self._loaded = False
+
+    def load(self, glob: GlobalVars) -> None:
+        """
+        Loads all slowed users from the database
+        :param glob: GlobalVars
+        :return: None
+        """
+        with glob.ses.no_autoflush:
+            self._index = {(slowed_user.guild_id, slowed_user.user_id): slowed_user.slowed_for
+                           for slowed_user in glob.ses.query(data_classes.SlowedUser).all()}
+        self._loaded = True
+
+    def get(self, glob: GlobalVars, user_id: int, guild_id: int) -> int or None:
+        if not self._loaded:
+            self.load(glob)
+        return self._index.get((guild_id, user_id))
+
+    def add(self, guild_id: int, user_id: int, slowed_for: int) -> None:
+        self._index[(guild_id, user_id)] = slowed_for
+
+    def remove(self, guild_id: int, user_id: int) -> None:
+        self._index.pop((guild_id, user_id), None)
+
+    def remove_guild(self, guild_id: int) -> None:
+        for key in [key for key in self._index if key[0] == guild_id]:
+            del self._index[key]
+
+slowed_user_index = SlowedUserIndex()
+
 def is_user_slowed(glob: GlobalVars, user_id: int, guild_id: int) -> (bool, int):
     """
-    Returns whether or not a user is slowed
+    Returns whether or not a user is slowed (from slowed_user_index)
     :param glob: GlobalVars
     :param user_id: ID of the user
     :param guild_id: ID of the guild
     :return: (bool, slowed_for)
     """
-    with glob.ses.no_autoflush:
-        slowed_user = glob.ses.query(data_classes.SlowedUser).filter_by(user_id=user_id, guild_id=guild_id).first()
-        if slowed_user is None:
-            return False, None
-        return True, slowed_user.slowed_for
+    slowed_for = slowed_user_index.get(glob, user_id, guild_id)
+    if slowed_for is None:
+        return False, None
+    return True, slowed_for
 
 # Torture
 def is_user_tortured(glob: GlobalVars, user_id: int, guild_id: int) -> (bool, int):
@@ -274,3 +399,42 @@ def delete_tortured_user(glob: GlobalVars, user_id: int, guild_id: int):
     with glob.ses.no_autoflush:
         glob.ses.query(data_classes.TorturedUser).filter_by(user_id=user_id, guild_id=guild_id).delete()
         glob.ses.commit()
+
+if __name__ == '__main__':
+    # message throughput benchmark: python -m database.guild
+    # slowed user check of on_message - database query vs slowed_user_index
+    from database.main import Base
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    import random
+    import timeit
+
+    class BenchmarkGlob:
+        def __init__(self, session):
+            self.ses = session
+
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(bind=engine)
+    bench_glob = BenchmarkGlob(sessionmaker(bind=engine)())
+
+    guild_count, slowed_count, message_count = 100, 2000, 20000
+    bench_glob.ses.add_all([data_classes.SlowedUser(guild_id=i % guild_count, user_id=i, user_name=f'user{i}', slowed_for=5)
+                            for i in range(slowed_count)])
+    bench_glob.ses.commit()
+
+    # every tenth message is from a slowed user
+    messages = [(random.randrange(slowed_count) if i % 10 == 0 else slowed_count + i, random.randrange(guild_count))
+                for i in range(message_count)]
+
+    def query_check():
+        for user_id, guild_id in messages:
+            bench_glob.ses.query(data_classes.SlowedUser).filter_by(user_id=user_id, guild_id=guild_id).first()
+
+    def index_check():
+        for user_id, guild_id in messages:
+            is_user_slowed(bench_glob, user_id, guild_id)
+
+    slowed_user_index.load(bench_glob)
+    for name, check in (('database query', query_check), ('slowed_user_index', index_check)):
+        seconds = timeit.timeit(check, number=1)
+        print(f'{name:<18} {message_count / seconds:12.0f} messages/s')
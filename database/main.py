@@ -1,5 +1,5 @@
 # noinspection PyUnresolvedReferences
-from sqlalchemy import create_engine, ForeignKey, Column, Integer, String, DateTime, Boolean, CHAR, Float, JSON
+from sqlalchemy import create_engine, ForeignKey, Column, Integer, String, DateTime, Boolean, CHAR, Float, JSON, Index
 # noinspection PyUnresolvedReferences
 from sqlalchemy.orm import relationship, backref, sessionmaker, declarative_base, declarative_mixin, scoped_session
 # noinspection PyUnresolvedReferences
@@ -8,6 +8,8 @@ from sqlalchemy.ext.orderinglist import ordering_list
 from sqlalchemy.exc import PendingRollbackError
 # noinspection PyUnresolvedReferences
 from sqlalchemy.orm.exc import ObjectDeletedError
+from sqlalchemy.pool import QueuePool
+from sqlalchemy import event
 
 Base = declarative_base()
 
@@ -20,17 +22,123 @@ def get_base_metadata():
 
     return Base.metadata
 
-def connect_to_db(first_time=False):
+DB_PATH = './db/database.db'
+DB_POOL_SIZE = 5  # connections kept open per process
+DB_POOL_OVERFLOW = 10  # extra connections opened under load
+
+# applied to every new connection (the bot and the web process share the file)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',  # readers do not block the writer and the other way around
+    'synchronous': 'NORMAL',  # safe with WAL, fsync only on checkpoint
+    'busy_timeout': 5000,  # ms to wait for a lock instead of failing with "database is locked"
+    'mmap_size': 268435456,  # 256 MB
+    'cache_size': -65536,  # 64 MB (negative = KiB)
+    'temp_store': 'MEMORY',
+}
+# journal_mode is stored in the database file, a read-only connection can not change it
+SQLITE_READ_ONLY_PRAGMAS = {key: value for key, value in SQLITE_PRAGMAS.items() if key != 'journal_mode'} | {'query_only': 'ON'}
+
+def create_db_engine(read_only: bool=False):
+    """
+    Creates the database engine with a connection pool and SQLITE_PRAGMAS set on every connection
+    :param read_only: open the database file in read-only mode (for the web process)
+    :return: Engine
+    """
+    if read_only:
+        url = f'sqlite:///file:{DB_PATH}?mode=ro&uri=true'
+        pragmas = SQLITE_READ_ONLY_PRAGMAS
+    else:
+        url = f'sqlite:///{DB_PATH}'
+        pragmas = SQLITE_PRAGMAS
+
+    engine = create_engine(url, echo=False,
+                           poolclass=QueuePool, pool_size=DB_POOL_SIZE, max_overflow=DB_POOL_OVERFLOW, pool_pre_ping=True,
+                           connect_args={'check_same_thread': False})
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        for key, value in pragmas.items():
+            cursor.execute(f'PRAGMA {key}={value}')
+        cursor.close()
+
+    return engine
+
+def connect_to_db(first_time=False, read_only=False):
     """
     Connects to the database
+    :param first_time: create missing tables
+    :param read_only: use read-only connections (the web process only reads, writes go through the bot)
     """
-    engine = create_engine(f'sqlite:///./db/database.db', echo=False)
+    engine = create_db_engine(read_only=read_only)
 
-    if first_time:
+    if first_time and not read_only:
         Base.metadata.create_all(bind=engine)
 
     session = sessionmaker(bind=engine, autoflush=False)
     return session()
 
+if __name__ == '__main__':
+    # benchmark: python -m database.main
+    # dashboard reads while the bot writes queue changes - default engine vs the tuned profile (bot engine + read-only engine)
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+    import tempfile
+    import threading
+    import time
+
+    seconds = 3
+    readers = 4
+
+    def run(writer_engine, reader_engine) -> dict:
+        with writer_engine.begin() as connection:
+            connection.execute(text('CREATE TABLE IF NOT EXISTS queue (id INTEGER PRIMARY KEY, guild_id INTEGER, position INTEGER, title TEXT)'))
+            connection.execute(text('CREATE INDEX IF NOT EXISTS ix_queue_guild_id_position ON queue (guild_id, position)'))
+
+        counts = {'writes': 0, 'reads': 0, 'errors': 0}
+        counts_lock = threading.Lock()
+        stop = time.monotonic() + seconds
+
+        def count(name: str) -> None:
+            with counts_lock:
+                counts[name] += 1
+
+        def write() -> None:
+            position = 0
+            while time.monotonic() < stop:
+                try:
+                    with writer_engine.begin() as connection:
+                        connection.execute(text('INSERT INTO queue (guild_id, position, title) VALUES (:guild_id, :position, :title)'),
+                                           [{'guild_id': guild_id, 'position': position, 'title': 'x' * 64} for guild_id in range(10)])
+                        connection.execute(text('DELETE FROM queue WHERE position < :position'), {'position': position - 50})
+                    position += 1
+                    count('writes')
+                except OperationalError:
+                    count('errors')
+
+        def read(guild_id: int) -> None:
+            while time.monotonic() < stop:
+                try:
+                    with reader_engine.connect() as connection:
+                        connection.execute(text('SELECT * FROM queue WHERE guild_id = :guild_id ORDER BY position'),
+                                           {'guild_id': guild_id}).fetchall()
+                    count('reads')
+                except OperationalError:
+                    count('errors')
+
+        threads = [threading.Thread(target=write)] + [threading.Thread(target=read, args=(i,)) for i in range(readers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        writer_engine.dispose()
+        reader_engine.dispose()
+        return counts
 
+    with tempfile.TemporaryDirectory() as directory:
+        default_engine = create_engine(f'sqlite:///{directory}/default.db', connect_args={'check_same_thread': False})
+        print('default ', run(default_engine, default_engine))
 
+        DB_PATH = f'{directory}/tuned.db'
+        print('tuned   ', run(create_db_engine(), create_db_engine(read_only=True)))
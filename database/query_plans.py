@@ -0,0 +1,57 @@
+import classes.video_class as video_class
+import classes.data_classes as data_classes
+from database.main import Base
+
+from sqlalchemy import create_engine, select, text
+
+def hot_queries() -> list:
+    """
+    Returns the hot lookups of the bot with the index each of them has to use
+    :return: [(description, statement, index name), ...]
+    """
+    return [
+        ('queue of a guild', select(video_class.Queue).filter_by(guild_id=1).order_by(video_class.Queue.position),
+         'ix_queue_guild_id_position'),
+        ('history of a guild', select(video_class.History).filter_by(guild_id=1).order_by(video_class.History.position),
+         'ix_history_guild_id_position'),
+        ('search list of a guild', select(video_class.SearchList).filter_by(guild_id=1).order_by(video_class.SearchList.position),
+         'ix_search_list_guild_id_position'),
+        ('now playing of a guild', select(video_class.NowPlaying).filter_by(guild_id=1),
+         'ix_now_playing_guild_id'),
+        ('saves of a guild', select(data_classes.Save).filter_by(guild_id=1).order_by(data_classes.Save.position),
+         'ix_saves_guild_id_position'),
+        ('videos of a save', select(video_class.SaveVideo).filter_by(guild_id=1, save_id=1),
+         'ix_save_videos_guild_id_save_id'),
+        ('ordered videos of a save', select(video_class.SaveVideo).filter_by(save_id=1).order_by(video_class.SaveVideo.position),
+         'ix_save_videos_save_id_position'),
+        ('slowed user (on_message)', select(data_classes.SlowedUser).filter_by(user_id=1, guild_id=1),
+         'ix_slowed_users_guild_id_user_id'),
+        ('tortured user', select(data_classes.TorturedUser).filter_by(user_id=1, guild_id=1),
+         'ix_tortured_users_guild_id_user_id'),
+        ('radio info by name', select(video_class.RadioInfo).filter_by(name='x'),
+         'ix_radio_info_name'),
+    ]
+
+def check_query_plans() -> list:
+    """
+    Creates the tables in an in-memory database and checks that the hot lookups use their indexes
+    :return: [(description, index, plan: str, used: bool), ...]
+    """
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(bind=engine)
+
+    results = []
+    with engine.connect() as connection:
+        for description, statement, index in hot_queries():
+            sql = str(statement.compile(engine, compile_kwargs={'literal_binds': True}))
+            plan = ' | '.join(row[-1] for row in connection.execute(text(f'EXPLAIN QUERY PLAN {sql}')))
+            results.append((description, index, plan, index in plan))
+    return results
+
+if __name__ == '__main__':
+    # query plan regression check: python -m database.query_plans
+    failed = 0
+    for description, index, plan, used in check_query_plans():
+        print(f'{"ok  " if used else "FAIL"} {description:<26} {plan}')
+        failed += not used
+    assert not failed, f'{failed} queries do not use their index'
@@ -1,7 +1,9 @@
 import json
 import math
-from time import time, sleep
+import queue
+from time import time
 from pathlib import Path
+from urllib.parse import urlencode
 
 from flask import Flask, render_template, request, url_for, redirect, send_file, abort, Response, send_from_directory
 from flask import session as flask_session
@@ -13,11 +15,15 @@ from classes.discord_classes import DiscordUser
 from utils.convert import struct_to_time, convert_duration
 from utils.log import log, collect_data
 from utils.files import get_readable_byte_size, get_icon_class_for_filename, get_log_files
+from utils.log_reader import log_file, LOG_TYPES
 from utils.translate import ftg
 from utils.video_time import video_time_from_start
 from utils.checks import check_isdigit
 from utils.web import *
 
+from ipc.flaskapp import update_listener
+from ipc.events import UPDATE_KEEPALIVE, snapshot_diff
+
 import config
 from oauth import Oauth
 
@@ -29,13 +35,21 @@ vlc_logo = config.VLC_LOGO
 default_discord_avatar = config.DEFAULT_DISCORD_AVATAR
 d_id = 349164237605568513
 
+# member fields the admin member lists show (the rest is not loaded)
+USERS_PAGE_FIELDS = ['id', 'discriminator', 'bot', 'name', 'display_name', 'avatar', 'accent_color',
+                     'created_at', 'joined_at', 'badges', 'guild_icon', 'role_ids']
+ROLE_MEMBERS_PAGE_FIELDS = ['id', 'discriminator', 'name', 'avatar', 'joined_at', 'raw_status']
+
+QUEUE_PAGE_SIZE = 50  # queue rows rendered at once, the rest is loaded on scroll
+QUEUE_ROW_ACTIONS = ['del_btn', 'up_btn', 'down_btn', 'top_btn', 'bottom_btn', 'duplicate_btn']  # answered with a queue diff
+
 # -------------------------------------------- Database -------------------------------------------- #
 
 from database.guild import *
 from database.main import *
 
 # db connect
-session = connect_to_db()
+session = connect_to_db(read_only=True)
 
 # --------------------------------------------- LOAD DATA --------------------------------------------- #
 
@@ -56,8 +70,73 @@ glob = GlobalVars(
     sc_var=None
 )
 
+# --------------------------------------------- UPDATES --------------------------------------------- #
+
+# reload guilds changed by the bot
+update_listener.add_callback(lambda event: expire_guild(glob, event['guild_id']))
+# reload all guilds after the subscription (re)connects - updates could have been missed while it was down
+update_listener.add_invalidate_callback(lambda event: expire_all_guilds(glob) if event.get('group') is None else None)
+
 # --------------------------------------------- FUNCTIONS --------------------------------------------- #
 
+def log_filters(args) -> tuple:
+    """
+    Returns log viewer filters of a request
+    :param args: request.args - log_type (can repeat) and guild_id
+    :return: ([log_type, ...] or None, guild_id or None)
+    """
+    log_types = [log_type for log_type in args.getlist('log_type') if log_type in LOG_TYPES] or None
+    guild_filter = args.get('guild_id') or None
+    return log_types, guild_filter
+
+def inflog_url(file_name: str, index: int or None, log_types: list or None, guild_filter: str or None, separate_lines: bool) -> str or None:
+    """
+    Returns url of the next chunk of the log viewer (None if there is no next chunk)
+    """
+    if index is None:
+        return None
+
+    params = [('type', file_name), ('index', index)]
+    params += [('log_type', log_type) for log_type in log_types or []]
+    if guild_filter:
+        params.append(('guild_id', guild_filter))
+    if separate_lines:
+        params.append(('separate_lines', 'True'))
+    return f'/admin/inflog?{urlencode(params)}'
+
+def queue_page(guild_object, start: int = 0) -> dict:
+    """
+    Returns one page of queue rows for main/htmx/queue_rows.html
+    :param guild_object: Guild object
+    :param start: position of the first row
+    :return: dict - tracks, next_after (id of the last row if there are more rows) and next_start
+    """
+    tracks = guild_object.queue[start:start + QUEUE_PAGE_SIZE]
+    next_start = start + len(tracks)
+    has_more = tracks and next_start < len(guild_object.queue)
+    return {'tracks': tracks, 'next_after': tracks[-1].id if has_more else None, 'next_start': next_start}
+
+def queue_track_position(guild_object, args) -> int or None:
+    """
+    Returns position of the queue track of a request (by track id, or by position for older links)
+    :param guild_object: Guild object
+    :param args: request.args - id or var
+    :return: int or None
+    """
+    track_id = args.get('id')
+    if track_id is not None:
+        if not track_id.isdigit():
+            return None
+        for position, track in enumerate(guild_object.queue):
+            if track.id == int(track_id):
+                return position
+        return None
+
+    var = args.get('var')
+    if var is None or not var.isdigit() or int(var) >= len(guild_object.queue):
+        return None
+    return int(var)
+
 def sort_guilds(_guilds: list, _allowed: list) -> list:
     """
     Separates guilds into 4 lists:
@@ -177,6 +256,11 @@ def inject_data():
 def make_session_permanent():
     flask_session.permanent = True
 
+@app.before_request
+def start_update_listener():
+    # started in every worker process (uWSGI forks the workers after the app is loaded)
+    update_listener.start()
+
 # @app.teardown_appcontext
 # def shutdown_session(exception=None):
 #     ses.remove()
@@ -346,7 +430,9 @@ async def guild_page(guild_id, key):
                            npd=npd,
                            bot_status=get_guild_bot_status(int(guild_id)),
                            last_updated=int(time()),
-                           radios=list(radio_dict.values())
+                           radios=list(radio_dict.values()),
+                           admin=user_id in authorized_users,
+                           **queue_page(guild_object)
                            )
 
 # ---------------------------------------------------- HTMX ------------------------------------------------------------
@@ -371,35 +457,32 @@ async def htmx_queue(guild_id):
         web_data = WebData(int(guild_id), user_name, user_id)
 
         keys = [act]
-        if 'queue_video' in keys:
-            var = request.args.get('var')
-            track = guild_object.queue[int(var)]
-            return render_template('main/htmx/queue_video.html', gi=int(guild_id), guild=guild_object,
-                                   struct_to_time=struct_to_time, convert_duration=convert_duration,
-                                   get_username=get_username, key=key, admin=admin, track=track)
+        old_order = [track.id for track in guild_object.queue]
+
+        var = request.args.get('var')
+        if act in QUEUE_ROW_ACTIONS and 'id' in request.args:
+            # rows are addressed by track id, their position changes
+            position = queue_track_position(guild_object, request.args)
+            if position is None:
+                return abort(404)
+            var = str(position)
 
         if 'del_btn' in keys:
-            var = request.args.get('var')
             log(web_data, 'remove', [var], log_type='web', author=web_data.author)
             execute_function('remove_def', web_data=web_data, number=int(var), list_type='queue')
         if 'up_btn' in keys:
-            var = request.args.get('var')
             log(web_data, 'up', [var], log_type='web', author=web_data.author)
             execute_function('web_up', web_data=web_data, number=int(var))
         if 'down_btn' in keys:
-            var = request.args.get('var')
             log(web_data, 'down', [var], log_type='web', author=web_data.author)
             execute_function('web_down', web_data=web_data, number=int(var))
         if 'top_btn' in keys:
-            var = request.args.get('var')
             log(web_data, 'top', [var], log_type='web', author=web_data.author)
             execute_function('web_top', web_data=web_data, number=int(var))
         if 'bottom_btn' in keys:
-            var = request.args.get('var')
             log(web_data, 'bottom', [var], log_type='web', author=web_data.author)
             execute_function('web_bottom', web_data=web_data, number=int(var))
         if 'duplicate_btn' in keys:
-            var = request.args.get('var')
             log(web_data, 'duplicate', [var], log_type='web', author=web_data.author)
             execute_function('web_duplicate', web_data=web_data, number=int(var))
 
@@ -453,10 +536,51 @@ async def htmx_queue(guild_id):
             log(web_data, 'web_load_queue', [load_name], log_type='web', author=web_data.author)
             execute_function('load_queue_save', web_data=web_data, save_name=load_name)
 
+        # reload the guild changed by the bot
+        expire_guild(glob, guild_id)
+        guild_object = guild(glob, guild_id)
+
+        if act in QUEUE_ROW_ACTIONS:
+            # the page moves, adds and removes only the changed rows
+            new_order = [track.id for track in guild_object.queue]
+            queue_diff = snapshot_diff({'queue': old_order}, {'queue': new_order}).get('queue', {'removed': [], 'added': [], 'order': new_order})
+            return Response(status=204, headers={'HX-Trigger': json.dumps({'queueDiff': queue_diff})})
+
+    return render_template('main/htmx/queue.html', gi=int(guild_id), guild=guild_object, key=key, admin=admin,
+                           **queue_page(guild_object))
+
+@app.route('/guild/<int:guild_id>/queue/rows')
+async def htmx_queue_rows(guild_id):
+    user = flask_session.get('discord_user', {})
+    user_id = user.get('id', 'WEB Guest')
+    admin = True if user_id in authorized_users else False
 
     guild_object = guild(glob, guild_id)
+    if guild_object is None:
+        return abort(404)
+
+    key = request.args.get('key')
+    if key != guild_object.data.key:
+        return abort(403)
 
-    return render_template('main/htmx/queue.html', gi=int(guild_id), guild=guild_object, key=key, admin=admin)
+    ids = request.args.get('ids')
+    if ids is not None:
+        # rows added to the queue
+        wanted = {int(track_id) for track_id in ids.split(',') if track_id.isdigit()}
+        page = {'tracks': [track for track in guild_object.queue if track.id in wanted], 'next_after': None, 'next_start': None}
+    else:
+        # next page - continues after the last loaded row, even if rows moved since
+        after = request.args.get('after', '')
+        start = request.args.get('start', '0')
+        start = int(start) if start.isdigit() else 0
+        if after.isdigit():
+            for position, track in enumerate(guild_object.queue):
+                if track.id == int(after):
+                    start = position + 1
+                    break
+        page = queue_page(guild_object, start)
+
+    return render_template('main/htmx/queue_rows.html', gi=int(guild_id), guild=guild_object, key=key, admin=admin, **page)
 
 @app.route('/guild/<int:guild_id>/history')
 async def htmx_history(guild_id):
@@ -526,8 +650,10 @@ async def htmx_modal(guild_id):
         return render_template('main/htmx/modals/saveModal.html', gi=int(guild_id), key=key)
 
     if modal_type == 'queue':
-        track_id = request.args.get('var')
-        track = guild_object.queue[int(track_id)]
+        position = queue_track_position(guild_object, request.args)
+        if position is None:
+            return abort(404)
+        track = guild_object.queue[position]
         return render_template('main/htmx/modals/video/queue.html', gi=int(guild_id), guild=guild_object, track=track, key=key)
     if modal_type == 'history':
         track_id = request.args.get('var')
@@ -536,8 +662,10 @@ async def htmx_modal(guild_id):
     if modal_type == 'now_playing':
         return render_template('main/htmx/modals/video/now_playing.html', gi=int(guild_id), guild=guild_object, key=key)
     if modal_type == 'queue_edit' and admin:
-        track_id = request.args.get('var')
-        track = guild_object.queue[int(track_id)]
+        position = queue_track_position(guild_object, request.args)
+        if position is None:
+            return abort(404)
+        track = guild_object.queue[position]
         return render_template('main/htmx/modals/video/queue_edit.html', gi=int(guild_id), guild=guild_object, track=track, key=key)
     if modal_type == 'history_edit' and admin:
         track_id = request.args.get('var')
@@ -556,14 +684,19 @@ async def update_page(guild_id):
         await abort(404)
 
     def respond_to_client():
-        last_updated = int(time())
-        while True:
-            last_updated_db = int(get_update(glob, guild_id))
-            if last_updated_db > last_updated:
-                last_updated = last_updated_db
-                response = {'update': True, 'last_updated': last_updated}
+        events = update_listener.subscribe(guild_id)
+        try:
+            while True:
+                try:
+                    event = events.get(timeout=UPDATE_KEEPALIVE)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+
+                response = {'update': True, 'last_updated': event['last_updated'], 'diff': event['diff']}
                 yield f'data: {json.dumps(response)}\n\n'
-            sleep(0.5)
+        finally:
+            update_listener.unsubscribe(guild_id, events)
 
     return Response(respond_to_client(), mimetype='text/event-stream')
 
@@ -658,7 +791,8 @@ async def admin_page():
     guild_list = sort_guilds(guilds(glob), flask_session.get('discord_user_guilds', []))
 
     return render_template('admin/admin.html', user=user, guild=guild_list,
-                           bot_status=get_guilds_bot_status(), last_played=guilds_last_played(glob))
+                           bot_status=get_guilds_bot_status(), last_played=guilds_last_played(glob),
+                           cache_stats=get_cache_stats())
 
 # Admin Files ---------------------------------------------------
 @app.route('/admin/log')
@@ -692,17 +826,22 @@ async def admin_log_page(file_name):
     if file_name not in file_names:
         return abort(404)
 
+    log_types, guild_filter = log_filters(request.args)
+    separate_lines = True if request.args.get('separate_lines') is not None else False
+
     try:
-        with open(f'{config.PARENT_DIR}db/log/{file_name}', 'r', encoding='utf-8') as f:
-            lines = list(reversed([(value, index) for index, value in enumerate(f.readlines())]))
-            chunks = math.ceil(len(lines) / 100)
+        if log_types or guild_filter:
+            lines, next_cursor = log_file(file_name).search(0, log_types, guild_filter)
+        else:
+            lines = log_file(file_name).chunk(0)
+            next_cursor = 1 if log_file(file_name).chunk_count() > 1 else None
     except Exception as e:
         log(request.remote_addr, [str(e)], log_type='error', author=user['username'])
         return abort(500)
 
-    separate_lines = True if request.args.get('separate_lines') is not None else False
-
-    return render_template('admin/text_file/iscroll.html', user=user, chunks=chunks, lines=lines, title='Log', log_type=file_name, separate_lines=separate_lines)
+    return render_template('admin/text_file/iscroll.html', user=user, lines=lines, title='Log', log_type=file_name,
+                           separate_lines=separate_lines, log_types=LOG_TYPES, selected_types=log_types,
+                           guild_filter=guild_filter, next_url=inflog_url(file_name, next_cursor, log_types, guild_filter, separate_lines))
 
 # @app.route('/admin/json/<path:file_name>')
 # async def admin_json_page(file_name):
@@ -763,33 +902,28 @@ async def admin_inflog_page():
     if log_type not in get_log_files():
         return abort(404)
 
-    try:
-        with open(f'{config.PARENT_DIR}db/log/{log_type}', 'r', encoding='utf-8') as f:
-            lines = list(reversed([(value, index) for index, value in enumerate(f.readlines())]))
-    except Exception as e:
-        log(request.remote_addr, [str(e)], log_type='error', author=user['username'])
-        return abort(500)
-
     index_num = request.args.get('index')
-    if index_num:
-        index_num = int(index_num)
-    else:
+    if index_num is None or not index_num.isdigit():
         return abort(400)
+    index_num = int(index_num)
 
-    if index_num > math.ceil(len(lines)/100):
-        return "<p>Index out of range</p>"
+    log_types, guild_filter = log_filters(request.args)
+    separate_lines = True if request.args.get('separate_lines') is not None else False
 
-    if index_num == 0:
-        lines = lines[:100]
-    else:
-        if index_num == math.ceil(len(lines)/100):
-            lines = lines[index_num*100:]
+    try:
+        if log_types or guild_filter:
+            # index is the number of lines from the end the search continues at
+            lines, next_cursor = log_file(log_type).search(index_num, log_types, guild_filter)
         else:
-            lines = lines[index_num*100:(index_num+1)*100]
-
-    separate_lines = True if request.args.get('separate_lines') is not None else False
+            # index is the chunk number
+            lines = log_file(log_type).chunk(index_num)
+            next_cursor = index_num + 1 if index_num + 1 < log_file(log_type).chunk_count() else None
+    except Exception as e:
+        log(request.remote_addr, [str(e)], log_type='error', author=user['username'])
+        return abort(500)
 
-    return render_template('admin/text_file/chunk.html', lines=lines, separate_lines=separate_lines)
+    return render_template('admin/text_file/chunk.html', lines=lines, separate_lines=separate_lines,
+                           next_url=inflog_url(log_type, next_cursor, log_types, guild_filter, separate_lines))
 
 # Admin user data ----------------------------------------------------
 @app.route('/admin/user/<int:user_id>', methods=['GET', 'POST'])
@@ -1023,14 +1157,14 @@ async def admin_guild_users_htmx(guild_id):
     if int(user['id']) not in authorized_users:
         return abort(403)
 
-    index = request.args.get('index')
-    if index is not None:
-        index = int(index)
-
-        # users = get_guild(int(guild_id)).members[index*5:(index+1)*5]
-        users = get_guild_members_index(int(guild_id), index*5, (index+1)*5)
+    cursor = request.args.get('cursor')
+    if cursor is not None and cursor.isdigit():
+        page = get_guild_members_page(int(guild_id), int(cursor), 25, USERS_PAGE_FIELDS)
+        if page is None:
+            return abort(404)
 
-        return render_template('admin/data/htmx/guild_users.html', users=users, badge_dict=badge_dict_new)
+        return render_template('admin/data/htmx/guild_users.html', users=page['members'], roles=page['roles'],
+                               next_cursor=page['next_cursor'], guild_id=guild_id, badge_dict=badge_dict_new)
 
     return abort(400)
 
@@ -1113,8 +1247,16 @@ async def admin_guild_roles_htmx(guild_id):
         if not role_id:
             return abort(400)
 
-        members = get_guild_role_members(int(guild_id), int(role_id))
-        return render_template('admin/data/htmx/roles/guild_roles_members.html', members=members, role_id=role_id)
+        cursor = request.args.get('cursor', '0')
+        if not cursor.isdigit():
+            return abort(400)
+
+        page = get_guild_role_members_page(int(guild_id), int(role_id), int(cursor), 50, ROLE_MEMBERS_PAGE_FIELDS)
+        if page is None:
+            return abort(404)
+
+        return render_template('admin/data/htmx/roles/guild_roles_members.html', members=page['members'],
+                               next_cursor=page['next_cursor'], cursor=int(cursor), role_id=role_id, guild_id=guild_id)
 
     if type_of == 'permissions':
         if not role_id:
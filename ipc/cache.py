@@ -0,0 +1,80 @@
+from ipc.flaskapp import send_arg, update_listener
+
+from collections import OrderedDict
+import threading
+import time
+import os
+
+DISCORD_CACHE_TTL = int(os.environ.get('DISCORD_CACHE_TTL', 300))  # seconds, upper bound if an invalidation is missed
+DISCORD_CACHE_SIZE = int(os.environ.get('DISCORD_CACHE_SIZE', 4096))  # max number of cached responses
+
+# invalidation group -> data types it covers (the bot sends update_bus.invalidate(group, guild_id or user_id))
+CACHE_GROUPS = {
+    'channels': ('guild_voice_channels', 'guild_voice_channels_index', 'guild_text_channels', 'guild_text_channels_index'),
+    'roles': ('guild_roles', 'guild_roles_index', 'guild_role_permissions'),
+    'user': ('user_name', 'user_data'),
+}
+
+class DiscordCache:
+    """
+    TTL + LRU cache of discord data the web process gets over IPC
+
+    Entries are keyed by (data_type, scope_id, *other args), scope_id is the guild id or the user id
+    the bot sends with invalidate events when the data changes
+    """
+    def __init__(self, ttl: int = DISCORD_CACHE_TTL, size: int = DISCORD_CACHE_SIZE):
+        self.ttl = ttl
+        self.size = size
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._started = False
+
+    def get_data(self, arg_dict: dict, scope_id: int):
+        """
+        Returns the response of a get_data request from the cache or over IPC
+        :param arg_dict: get_data request
+        :param scope_id: guild id or user id the data belongs to
+        :return: response
+        """
+        if not self._started:
+            # invalidate events come over the update subscription
+            self._started = True
+            update_listener.start()
+
+        key = (arg_dict['data_type'], scope_id) + tuple(value for name, value in sorted(arg_dict.items())
+                                                        if name not in ('type', 'data_type'))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        value = send_arg(arg_dict)
+        if value is None:
+            return None
+
+        with self._lock:
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+        return value
+
+    def invalidate(self, event: dict) -> None:
+        """
+        Removes entries of an invalidate event (everything if the group is None)
+        :param event: {'type': 'invalidate', 'group': str or None, 'id': int or None}
+        """
+        with self._lock:
+            if event.get('group') is None:
+                self._entries.clear()
+                return
+
+            data_types = CACHE_GROUPS.get(event['group'], ())
+            for key in [key for key in self._entries if key[0] in data_types and key[1] == event['id']]:
+                del self._entries[key]
+
+discord_cache = DiscordCache()
+update_listener.add_invalidate_callback(discord_cache.invalidate)
@@ -0,0 +1,137 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from utils.global_vars import GlobalVars
+
+import classes.video_class as video_class
+import database.guild as db
+
+from sqlalchemy import select, func
+from sqlalchemy.orm import object_session
+
+import threading
+import asyncio
+
+UPDATE_KEEPALIVE = 15  # seconds, ping is sent to idle subscribers to detect dead connections
+
+def guild_snapshot(guild_object) -> dict:
+    """
+    Returns the state of the guild the web page shows
+    :param guild_object: Guild object
+    :return: dict
+    """
+    options = guild_object.options
+    return {
+        'queue': [video.id for video in guild_object.queue],
+        'now_playing': guild_object.now_playing.id if guild_object.now_playing else None,
+        # counted in the database (ix_history_guild_id_position), loading the relationship would read the whole history
+        'history': object_session(guild_object).scalar(
+            select(func.count()).select_from(video_class.History).where(video_class.History.guild_id == guild_object.id)),
+        'options': {column.name: getattr(options, column.name) for column in options.__table__.columns if column.name != 'last_updated'},
+    }
+
+def snapshot_diff(old: dict or None, new: dict) -> dict:
+    """
+    Returns what changed between two guild snapshots
+    queue -> {'removed': [id, ...], 'added': [{'id': id, 'position': int}, ...], 'order': [id, ...]}
+    other sections -> True
+    :param old: dict - previous snapshot (None = everything changed)
+    :param new: dict - current snapshot
+    :return: dict - changed sections
+    """
+    if old is None:
+        return {key: True for key in new.keys()}
+
+    diff = {}
+    for key, value in new.items():
+        if old.get(key) == value:
+            continue
+
+        if key == 'queue':
+            old_ids = set(old['queue'])
+            new_ids = set(value)
+            diff['queue'] = {
+                'removed': [video_id for video_id in old['queue'] if video_id not in new_ids],
+                'added': [{'id': video_id, 'position': position} for position, video_id in enumerate(value) if video_id not in old_ids],
+                'order': value,
+            }
+        else:
+            diff[key] = True
+
+    return diff
+
+class UpdateBus:
+    """
+    Publishes guild updates to the web processes subscribed over IPC
+
+    Subscribers are asyncio queues of the IPC server loop,
+    events are published from any thread after the changes are committed
+    """
+    def __init__(self):
+        self._subscribers = []  # [(loop, asyncio.Queue), ...]
+        self._snapshots = {}  # guild_id -> last published snapshot
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> asyncio.Queue:
+        """
+        Registers a subscriber on the running loop
+        :return: asyncio.Queue - published events
+        """
+        queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.append((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        with self._lock:
+            self._subscribers = [subscriber for subscriber in self._subscribers if subscriber[1] is not queue]
+            if not self._subscribers:
+                self._snapshots.clear()
+
+    def publish(self, glob: GlobalVars, guild_id: int) -> None:
+        """
+        Sends the update of the guild (with the diff since the last update) to all subscribers
+        :param glob: GlobalVars
+        :param guild_id: ID of the guild
+        :return: None
+        """
+        with self._lock:
+            subscribers = list(self._subscribers)
+        if not subscribers:
+            return
+
+        guild_object = db.guild(glob, guild_id)
+        if guild_object is None:
+            return
+
+        snapshot = guild_snapshot(guild_object)
+        with self._lock:
+            diff = snapshot_diff(self._snapshots.get(guild_id), snapshot)
+            self._snapshots[guild_id] = snapshot
+
+        event = {'type': 'update',
+                 'guild_id': guild_id,
+                 'update': True,
+                 'last_updated': guild_object.options.last_updated,
+                 'diff': diff}
+
+        self._send(subscribers, event)
+
+    def invalidate(self, group: str, scope_id: int) -> None:
+        """
+        Tells the subscribers that cached discord data changed (see ipc.cache.CACHE_GROUPS)
+        :param group: str - 'channels', 'roles' or 'user'
+        :param scope_id: int - guild id (channels, roles) or user id (user)
+        :return: None
+        """
+        with self._lock:
+            subscribers = list(self._subscribers)
+        self._send(subscribers, {'type': 'invalidate', 'group': group, 'id': scope_id})
+
+    @staticmethod
+    def _send(subscribers: list, event: dict) -> None:
+        for loop, queue in subscribers:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+
+update_bus = UpdateBus()
@@ -1,8 +1,12 @@
-from utils.unpickle import unpickle
+from ipc.serialize import encode, decode, DecodeError
 
+import concurrent.futures
+import itertools
+import threading
 import socket
 import struct
-import pickle
+import queue
+import time
 import os
 
 inside_docker = os.environ.get("INSIDE_DOCKER", False)
@@ -10,29 +14,124 @@ send_host = os.environ.get("SEND_HOST", '172.0.0.1')
 
 HOST = '127.0.0.1' if not inside_docker or not inside_docker == 'true' else send_host  # The server's hostname or IP address
 PORT = 5421  # The port used by the server
+RECONNECT_DELAY = 2  # seconds between attempts to reconnect the update subscription
 
-def send_arg(arg_dict: dict, get_response: bool = True):
+IPC_POOL_SIZE = 2  # persistent connections per web process
+IPC_TIMEOUT = 120  # seconds to wait for a response
+
+class IPCConnection:
     """
-    Send an argument dictionary to the socket and return the response
-    :param arg_dict: dictionary to send
-    :param get_response: whether to wait for a response
-    :return: response dictionary or None
+    Persistent connection to the IPC server
+
+    Requests are sent as {'request_id': int, 'request': dict}, so many requests can wait at once,
+    a reader thread hands the responses to the waiting threads
     """
-    # Create socket
-    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    s.connect((HOST, PORT))
+    def __init__(self):
+        self._sock = None
+        self._pending = {}  # request_id -> concurrent.futures.Future
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    def _connect(self) -> socket.socket:
+        # has to be called with self._lock acquired
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.connect((HOST, PORT))
+        self._sock = sock
+        threading.Thread(target=self._read, args=(sock,), name='ipc-reader', daemon=True).start()
+        return sock
 
-    # serialize and send
-    msg = pickle.dumps(arg_dict)
-    send_msg(s, msg)
+    def _close(self, sock: socket.socket, error: Exception) -> None:
+        """
+        Closes the connection and fails all requests waiting on it
+        """
+        with self._lock:
+            if self._sock is sock:
+                self._sock = None
+            pending, self._pending = self._pending, {}
+        sock.close()
 
-    if get_response:
-        response = recv_msg(s)
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
 
-        if response is None:
+    def _read(self, sock: socket.socket):
+        error = ConnectionError('IPC connection closed')
+        try:
+            while True:
+                data = recv_msg(sock)
+                if data is None:
+                    break
+
+                envelope = decode(data)
+                with self._lock:
+                    future = self._pending.pop(envelope['request_id'], None)
+                if future is not None and not future.done():
+                    future.set_result(envelope['response'])
+        except OSError:
+            pass
+        except (DecodeError, KeyError, TypeError) as e:
+            # the response can not be matched to its request - none of the pending ones would get an answer
+            error = ConnectionError(f'IPC response could not be decoded: {e}')
+
+        self._close(sock, error)
+
+    def request(self, arg_dict: dict, get_response: bool = True):
+        """
+        Sends a request and waits for the response
+        :param arg_dict: dictionary to send
+        :param get_response: whether to wait for a response
+        :return: response or None
+        """
+        future = concurrent.futures.Future()
+        with self._lock:
+            sock = self._sock if self._sock is not None else self._connect()
+            request_id = next(self._ids)
+            if get_response:
+                self._pending[request_id] = future
+
+        try:
+            with self._send_lock:
+                send_msg(sock, encode({'request_id': request_id, 'request': arg_dict}))
+        except OSError as e:
+            self._close(sock, e)
+            raise
+
+        if not get_response:
             return None
 
-        return unpickle(response)
+        try:
+            return future.result(timeout=IPC_TIMEOUT)
+        finally:
+            # the response of a timed out request is dropped by the reader
+            with self._lock:
+                self._pending.pop(request_id, None)
+
+class IPCPool:
+    """
+    Persistent connections of the web process, every request goes to the least busy one
+    """
+    def __init__(self, size: int = IPC_POOL_SIZE):
+        self._connections = [IPCConnection() for _ in range(max(1, size))]
+
+    def request(self, arg_dict: dict, get_response: bool = True):
+        connection = min(self._connections, key=lambda c: c.in_flight)
+        return connection.request(arg_dict, get_response=get_response)
+
+ipc_pool = IPCPool()
+
+def send_arg(arg_dict: dict, get_response: bool = True):
+    """
+    Send an argument dictionary to the IPC server and return the response
+    :param arg_dict: dictionary to send
+    :param get_response: whether to wait for a response
+    :return: response or None
+    """
+    return ipc_pool.request(arg_dict, get_response=get_response)
 
 def send_msg(sock, msg: bytes):
     """
@@ -75,3 +174,163 @@ def recv_all(sock, n) -> bytes or None:
             return None
         data.extend(packet)
     return data
+
+class UpdateListener:
+    """
+    Keeps one subscription to guild updates of the bot per web process
+    and fans the events out to the SSE clients of the guild
+    """
+    def __init__(self):
+        self._clients = {}  # guild_id -> {queue.Queue, ...}
+        self._callbacks = []
+        self._invalidate_callbacks = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add_callback(self, callback) -> None:
+        """
+        Adds function called with every update event (before it is sent to the clients)
+        :param callback: function(event: dict)
+        """
+        self._callbacks.append(callback)
+
+    def add_invalidate_callback(self, callback) -> None:
+        """
+        Adds function called with every invalidate event
+        ({'type': 'invalidate', 'group': None, 'id': None} after (re)connecting - events could have been missed)
+        :param callback: function(event: dict)
+        """
+        self._invalidate_callbacks.append(callback)
+
+    def start(self) -> None:
+        """
+        Starts the listener thread (if it is not running - a forked process does not have it)
+        """
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._listen, name='ipc-update-listener', daemon=True)
+                self._thread.start()
+
+    def subscribe(self, guild_id: int) -> queue.Queue:
+        """
+        Registers SSE client of the guild (starts the listener thread on first use)
+        :param guild_id: ID of the guild
+        :return: queue.Queue - update events of the guild
+        """
+        client_queue = queue.Queue()
+        with self._lock:
+            self._clients.setdefault(guild_id, set()).add(client_queue)
+        self.start()
+        return client_queue
+
+    def unsubscribe(self, guild_id: int, client_queue: queue.Queue) -> None:
+        with self._lock:
+            clients = self._clients.get(guild_id, set())
+            clients.discard(client_queue)
+            if not clients:
+                self._clients.pop(guild_id, None)
+
+    def _dispatch(self, event: dict) -> None:
+        for callback in self._callbacks:
+            callback(event)
+
+        with self._lock:
+            clients = list(self._clients.get(event['guild_id'], ()))
+        for client_queue in clients:
+            client_queue.put(event)
+
+    def _invalidate(self, event: dict) -> None:
+        for callback in self._invalidate_callbacks:
+            callback(event)
+
+    def _listen(self):
+        while True:
+            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            try:
+                s.connect((HOST, PORT))
+                send_msg(s, encode({'type': 'subscribe'}))
+                self._invalidate({'type': 'invalidate', 'group': None, 'id': None})
+
+                while True:
+                    data = recv_msg(s)
+                    if data is None:
+                        break
+
+                    event = decode(data)
+                    if event.get('type') == 'update':
+                        self._dispatch(event)
+                    elif event.get('type') == 'invalidate':
+                        self._invalidate(event)
+            except (OSError, DecodeError):
+                # reconnect, the invalidate event after it covers the missed updates
+                pass
+            finally:
+                s.close()
+
+            time.sleep(RECONNECT_DELAY)
+
+update_listener = UpdateListener()
+
+if __name__ == '__main__':
+    # latency / throughput of one connection per request vs the pool: python -m ipc.flaskapp
+    # (against an echo server with the same framing, so only the transport is measured)
+    from concurrent.futures import ThreadPoolExecutor
+    import asyncio
+    import ipc.main
+
+    async def _echo_client(client):
+        data = await ipc.main.recv_msg(client)
+        request_dict = decode(data)
+        if 'request_id' not in request_dict:
+            await ipc.main.send_msg(client, encode(request_dict))
+            client.close()
+            return
+
+        while data is not None:
+            request_dict = decode(data)
+            await ipc.main.send_msg(client, encode({'request_id': request_dict['request_id'], 'response': request_dict['request']}))
+            data = await ipc.main.recv_msg(client)
+        client.close()
+
+    def _serve(server_sock: socket.socket):
+        loop = asyncio.new_event_loop()
+        tasks = set()
+
+        async def accept():
+            while True:
+                client, _ = await loop.sock_accept(server_sock)
+                task = loop.create_task(_echo_client(client))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+        loop.run_until_complete(accept())
+
+    echo_server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    echo_server.bind(('127.0.0.1', 0))
+    echo_server.listen(128)
+    echo_server.setblocking(False)
+    HOST, PORT = echo_server.getsockname()
+    threading.Thread(target=_serve, args=(echo_server,), daemon=True).start()
+
+    def one_shot(arg_dict: dict):
+        with socket.create_connection((HOST, PORT)) as sock:
+            send_msg(sock, encode(arg_dict))
+            return decode(recv_msg(sock))
+
+    pool = IPCPool()
+    request = {'type': 'get_data', 'data_type': 'guild', 'guild_id': 1}
+    count = 2000
+    for name, send in (('one-shot', one_shot), ('pooled', pool.request)):
+        assert send(request) == request
+
+        start = time.perf_counter()
+        for _ in range(count):
+            send(request)
+        latency = (time.perf_counter() - start) / count * 1e6
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            start = time.perf_counter()
+            list(executor.map(lambda _: send(request), range(count)))
+            throughput = count / (time.perf_counter() - start)
+
+        print(f'{name:<9} latency {latency:7.1f} us  throughput (16 threads) {throughput:8.0f} req/s')
@@ -0,0 +1,216 @@
+import classes.video_class
+import classes.data_classes
+import classes.discord_classes
+
+from sqlalchemy.orm import class_mapper
+from functools import lru_cache
+from sqlalchemy.orm.exc import UnmappedClassError
+import discord
+import codecs
+import json
+
+# first byte of every message, bump when a schema changes (both sides have to be updated together)
+WIRE_VERSION = 2
+# keys of the dicts the format is built from (dicts using them as keys are always sent as $d pairs)
+RESERVED_KEYS = ('$t', '$d')
+
+class DecodeError(ValueError):
+    """
+    IPC message could not be decoded (wrong version, invalid json, unknown or malformed tag)
+    """
+
+@lru_cache(maxsize=None)
+def get_schemas() -> (dict, dict):
+    """
+    Returns the schemas of the objects sent over IPC
+    Built on first encode/decode - reading the columns configures the mappers,
+    which fails while the model modules are still imported
+    :return: ({type tag: (class, fields)}, {class: type tag})
+             objects are sent as {'$t': tag, 'v': [values in the order of fields]}
+    """
+    schemas = {
+        'ReturnData': (classes.data_classes.ReturnData, ('response', 'message', 'video', 'terminate')),
+        'WebData': (classes.data_classes.WebData, ('guild_id', 'author', 'author_id')),
+    }
+
+    # discord objects are sent with their slots
+    discord_classes = [
+        classes.discord_classes.DiscordGuild,
+        classes.discord_classes.DiscordUser,
+        classes.discord_classes.DiscordMember,
+        classes.discord_classes.DiscordChannel,
+        classes.discord_classes.DiscordRole,
+        classes.discord_classes.DiscordInvite,
+    ]
+    for discord_class in discord_classes:
+        schemas[discord_class.__name__] = (discord_class, tuple(discord_class.__slots__))
+
+    # database rows are sent with their columns (relationships are not sent)
+    orm_classes = [
+        classes.data_classes.GuildData,
+        classes.data_classes.Options,
+        classes.data_classes.Save,
+        classes.video_class.Queue,
+        classes.video_class.NowPlaying,
+        classes.video_class.History,
+        classes.video_class.SearchList,
+        classes.video_class.SaveVideo,
+    ]
+    for orm_class in orm_classes:
+        schemas[orm_class.__name__] = (orm_class, tuple(column.key for column in class_mapper(orm_class).column_attrs))
+
+    return schemas, {schema[0]: tag for tag, schema in schemas.items()}
+
+def _encode_default(obj):
+    """
+    json.dumps hook for everything that is not a basic type
+    """
+    schemas, tags = get_schemas()
+    tag = tags.get(type(obj))
+    if tag is not None:
+        fields = schemas[tag][1]
+        return {'$t': tag, 'v': [getattr(obj, field, None) for field in fields]}
+
+    if isinstance(obj, discord.Colour):
+        return {'$t': 'Colour', 'v': [obj.value]}
+    if isinstance(obj, discord.Permissions):
+        return {'$t': 'Permissions', 'v': [obj.value]}
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+
+    raise TypeError(f'No IPC schema for {type(obj).__name__}')
+
+def _prepare(obj):
+    """
+    Converts dicts with non-string or reserved keys (json would turn the keys to strings,
+    a '$t' or '$d' key would be read as a tag)
+    """
+    if isinstance(obj, dict):
+        if all(isinstance(key, str) and key not in RESERVED_KEYS for key in obj.keys()):
+            return {key: _prepare(value) for key, value in obj.items()}
+        return {'$d': [[_prepare(key), _prepare(value)] for key, value in obj.items()]}
+    if isinstance(obj, (list, tuple)):
+        return [_prepare(value) for value in obj]
+    return obj
+
+def _new_instance(cls):
+    try:
+        return class_mapper(cls).class_manager.new_instance()
+    except UnmappedClassError:
+        return cls.__new__(cls)
+
+def _decode_pairs(pairs) -> dict:
+    if not isinstance(pairs, list) or not all(isinstance(pair, list) and len(pair) == 2 for pair in pairs):
+        raise DecodeError('Malformed $d pairs')
+    try:
+        # tuple keys were sent as lists
+        return {tuple(key) if isinstance(key, list) else key: value for key, value in pairs}
+    except TypeError as e:
+        raise DecodeError(f'Unhashable $d key: {e}') from e
+
+def _decode_hook(obj: dict):
+    if '$d' in obj:
+        if len(obj) != 1:
+            raise DecodeError(f'Malformed $d object: {sorted(obj.keys())}')
+        return _decode_pairs(obj['$d'])
+
+    if '$t' not in obj:
+        return obj
+
+    tag = obj['$t']
+    values = obj.get('v')
+    if len(obj) != 2 or not isinstance(values, list):
+        raise DecodeError(f'Malformed object of tag {tag!r}')
+
+    if tag in ('Colour', 'Permissions'):
+        if len(values) != 1 or not isinstance(values[0], int):
+            raise DecodeError(f'Malformed {tag} value')
+        return discord.Colour(values[0]) if tag == 'Colour' else discord.Permissions(values[0])
+
+    schema = get_schemas()[0].get(tag) if isinstance(tag, str) else None
+    if schema is None:
+        raise DecodeError(f'Unknown IPC tag: {tag!r}')
+    cls, fields = schema
+    if len(values) != len(fields):
+        raise DecodeError(f'{tag} has {len(values)} values, expected {len(fields)}')
+
+    instance = _new_instance(cls)
+    for field, value in zip(fields, values):
+        setattr(instance, field, value)
+    return instance
+
+class _Encoder(json.JSONEncoder):
+    def default(self, obj):
+        return _prepare(_encode_default(obj))
+
+def encode(obj) -> bytes:
+    """
+    Serializes obj for IPC
+    :param obj: basic types and objects with a schema in get_schemas()
+    :return: bytes - version byte + json
+    """
+    return bytes((WIRE_VERSION,)) + json.dumps(_prepare(obj), cls=_Encoder, separators=(',', ':')).encode('utf-8')
+
+def decode(data):
+    """
+    Deserializes IPC message
+    :param data: bytes or bytearray - message from recv_msg
+    :return: decoded object
+    :raises DecodeError: the message is not a valid IPC message
+    """
+    if not data or data[0] != WIRE_VERSION:
+        raise DecodeError(f'Unsupported IPC wire version: {data[0] if data else None}')
+
+    try:
+        # decode straight from the receive buffer without copying it
+        text = codecs.decode(memoryview(data)[1:], 'utf-8')
+        return json.loads(text, object_hook=_decode_hook)
+    except DecodeError:
+        raise
+    except ValueError as e:
+        # invalid utf-8 or json
+        raise DecodeError(str(e)) from e
+
+if __name__ == '__main__':
+    # size / latency comparison with pickle: python -m ipc.serialize
+    import pickle
+    from timeit import timeit
+
+    def _row(cls, index):
+        row = _new_instance(cls)
+        for field in get_schemas()[0][cls.__name__][1]:
+            setattr(row, field, None)
+        row.id, row.position, row.guild_id = index, index, 1
+        row.class_type, row.author, row.url = 'Video', 349164237605568513, f'https://www.youtube.com/watch?v={index:011d}'
+        row.title, row.duration, row.channel_name = f'Video number {index}', '215', 'Channel'
+        row.picture = f'https://img.youtube.com/vi/{index:011d}/default.jpg'
+        return row
+
+    # a queue page response and a request with a web_data of a guild
+    payload = {'request_id': 1,
+               'response': [_row(classes.video_class.Queue, index) for index in range(50)],
+               'web_data': classes.data_classes.WebData(1, 'author', 2),
+               'status': {1: 'playing', 2: 'stopped'}}
+    assert decode(encode(payload))['status'] == payload['status']
+
+    number = 2000
+    for name, dumps, loads in (('json schema', encode, decode),
+                               ('pickle', pickle.dumps, pickle.loads)):
+        data = dumps(payload)
+        encode_time = timeit(lambda: dumps(payload), number=number) / number * 1e6
+        decode_time = timeit(lambda: loads(data), number=number) / number * 1e6
+        print(f'{name:<12} {len(data):>6} bytes  encode {encode_time:7.1f} us  decode {decode_time:7.1f} us')
+
+    # malformed messages raise DecodeError
+    for bad in (b'\x01{}', bytes((WIRE_VERSION,)) + b'{', bytes((WIRE_VERSION,)) + b'{"$t":"Nope","v":[]}',
+                bytes((WIRE_VERSION,)) + b'{"$d":[[1]]}', bytes((WIRE_VERSION,)) + b'{"$t":"WebData","v":[1]}'):
+        try:
+            decode(bad)
+        except DecodeError as e:
+            print(f'DecodeError: {e}')
+        else:
+            raise AssertionError(f'{bad!r} was decoded')
+
+    # user dicts with reserved keys survive the round trip
+    reserved = {'$t': 'WebData', 'v': [1, 2, 3], 'nested': {'$d': [[1, 2]]}}
+    assert decode(encode(reserved)) == reserved
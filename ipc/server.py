@@ -1,12 +1,15 @@
 from utils.global_vars import GlobalVars
 
 from classes.data_classes import ReturnData, GuildData
-from classes.discord_classes import DiscordChannel, DiscordRole, DiscordUser, DiscordInvite, DiscordMember
+from classes.discord_classes import DiscordChannel, DiscordRole, DiscordUser, DiscordInvite, DiscordMember, guild_role_table
 
 from utils.log import log
 from utils.discord import get_username
-from utils.save import update_guilds
+from utils.save import update_guilds, write_behind
 from utils.saves import new_queue_save, delete_queue_save, rename_queue_save, load_queue_save
+from utils.radio import radio_refresher
+from utils.video_info import video_info_store
+from utils.source import stream_cache, extraction_pool
 
 from database.guild import guild, guild_ids
 
@@ -23,9 +26,14 @@ import web_func.options
 import web_func.admin
 
 from ipc.main import send_msg, recv_msg
+from ipc.serialize import encode, decode, DecodeError
+from ipc.events import update_bus, UPDATE_KEEPALIVE
 
+from contextlib import asynccontextmanager
+import itertools
 import asyncio
-import pickle
+import inspect
+import bisect
 import socket
 import sys
 import os
@@ -34,10 +42,136 @@ inside_docker = os.environ.get("INSIDE_DOCKER", False)
 
 HOST = '127.0.0.1' if not inside_docker or not inside_docker == 'true' else '0.0.0.0'  # The server's hostname or IP address
 PORT = 5421  # The port used by the server
+IPC_BACKLOG = 64  # pending connections
+IPC_MAX_IN_FLIGHT = 64  # requests processed at once (over all connections)
+MEMBER_PAGE_MAX = 500  # max members in one page of guild_members_page / guild_role_members_page
 
-async def execute_function(request_dict, glob: GlobalVars) -> ReturnData:
+class IPCFunction:
+    """
+    Function callable from the web
+
+    :param func: function to call
+    :param args: names of the arguments the request has to contain
+    :param by_guild_id: call as func(glob, guild_id, **args) instead of func(web_data, glob, **args)
+    :param bot_loop: run the coroutine on the bot loop (needs discord objects of the bot loop)
+    """
+    def __init__(self, func, args: tuple = (), by_guild_id: bool = False, bot_loop: bool = False):
+        self.func = func
+        self.args = args
+        self.by_guild_id = by_guild_id
+        self.bot_loop = bot_loop
+
+    async def __call__(self, web_data, glob: GlobalVars, args: dict) -> ReturnData:
+        missing = [name for name in self.args if name not in args]
+        if missing:
+            return ReturnData(False, f'Missing arguments: {", ".join(missing)} --> Internal error (contact developer)')
+
+        kwargs = {name: args[name] for name in self.args}
+
+        if self.by_guild_id:
+            response = self.func(glob, web_data.guild_id, **kwargs)
+        else:
+            response = self.func(web_data, glob, **kwargs)
+
+        if self.bot_loop:
+            return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(response, glob.bot.loop))
+        if inspect.isawaitable(response):
+            return await response
+        return response
+
+# function_name -> IPCFunction
+FUNCTIONS = {
+    # queue
+    'remove_def': IPCFunction(commands.queue.remove_def, ('number', 'list_type')),
+    'web_up': IPCFunction(web_func.move.web_up, ('number',)),
+    'web_down': IPCFunction(web_func.move.web_down, ('number',)),
+    'web_top': IPCFunction(web_func.move.web_top, ('number',)),
+    'web_bottom': IPCFunction(web_func.move.web_bottom, ('number',)),
+    'web_duplicate': IPCFunction(web_func.move.web_duplicate, ('number',)),
+
+    # player
+    'play_def': IPCFunction(commands.player.play_def),
+    'stop_def': IPCFunction(commands.voice.stop_def),
+    'pause_def': IPCFunction(commands.voice.pause_def),
+    'skip_def': IPCFunction(commands.queue.skip_def),
+
+    'loop_command_def': IPCFunction(commands.player.loop_command_def),
+    'shuffle_def': IPCFunction(commands.queue.shuffle_def),
+    'clear_def': IPCFunction(commands.queue.clear_def),
+
+    # voice
+    'web_disconnect': IPCFunction(web_func.voice.web_disconnect),
+    'web_join': IPCFunction(web_func.voice.web_join, ('form',)),
+
+    # adding to queue
+    'web_queue': IPCFunction(web_func.queue.web_queue, ('video_type', 'position')),
+    'queue_command_def': IPCFunction(commands.queue.queue_command_def, ('url',)),
+    'web_queue_from_radio': IPCFunction(web_func.queue.web_queue_from_radio, ('radio_name',)),
+
+    # saves
+    'new_queue_save': IPCFunction(new_queue_save, ('save_name', 'author_name', 'author_id'), by_guild_id=True),
+    'load_queue_save': IPCFunction(load_queue_save, ('save_name',), by_guild_id=True),
+    'delete_queue_save': IPCFunction(delete_queue_save, ('save_name',), by_guild_id=True),
+    'rename_queue_save': IPCFunction(rename_queue_save, ('old_name', 'new_name'), by_guild_id=True),
+
+    'volume_command_def': IPCFunction(commands.voice.volume_command_def, ('volume',)),
+    'set_video_time': IPCFunction(commands.player.set_video_time, ('time_stamp',)),
+
+    # user edit
+    'web_user_options_edit': IPCFunction(web_func.options.web_user_options_edit, ('form',)),
+
+    # admin
+    'web_video_edit': IPCFunction(web_func.admin.web_video_edit, ('form',)),
+    'web_options_edit': IPCFunction(web_func.admin.web_options_edit, ('form',)),
+
+    'web_delete_guild': IPCFunction(web_func.admin.web_delete_guild, ('guild_id',)),
+    'web_disconnect_guild': IPCFunction(web_func.admin.web_disconnect_guild, ('guild_id',), bot_loop=True),
+    'web_create_invite': IPCFunction(web_func.admin.web_create_invite, ('guild_id',), bot_loop=True),
+
+    'download_guild': IPCFunction(commands.chat_export.download_guild, ('guild_id',)),
+    'download_guild_channel': IPCFunction(commands.chat_export.download_guild_channel, ('channel_id',)),
+}
+
+async def call_function(web_data, glob: GlobalVars, func_name: str, args: dict or None) -> ReturnData:
+    """
+    Calls a function from FUNCTIONS
+    :param web_data: WebData
+    :param glob: GlobalVars
+    :param func_name: name of the function
+    :param args: arguments of the function
+    :return: ReturnData
+    """
+    function = FUNCTIONS.get(func_name)
+    if function is None:
+        return ReturnData(False, f'Unknown function: {func_name}')
+
+    return await function(web_data, glob, args if args is not None else {})
+
+async def execute_batch(web_data, glob: GlobalVars, operations: list) -> list:
+    """
+    Executes several functions in one request
+    Saves of the operations (write_behind.mark) are committed once after the last one,
+    the batch is not atomic - functions that commit the session themselves commit right away
+    and a failed operation does not undo the earlier ones (the session is shared with the bot loop, it can not be rolled back)
+    :param web_data: WebData
+    :param glob: GlobalVars
+    :param operations: [{'function_name': str, 'args': dict}, ...] - executed in order
+    :return: [ReturnData, ...] - result of every operation
+    """
+    results = []
+    with write_behind.hold(glob):
+        for operation in operations:
+            try:
+                results.append(await call_function(web_data, glob, operation['function_name'], operation.get('args')))
+            except Exception as e:
+                log(web_data, f'Batch operation failed: {operation.get("function_name")} -> {e}', log_type='error')
+                results.append(ReturnData(False, f'{e}'))
+    return results
+
+async def execute_function(request_dict, glob: GlobalVars) -> ReturnData or list:
     """
     Execute a function from a request dict
+    function_name 'batch' executes args['operations'] and returns a list of ReturnData
     :param request_dict: A request dict
     :param glob: GlobalVars
     :type request_dict: dict
@@ -48,102 +182,76 @@ async def execute_function(request_dict, glob: GlobalVars) -> ReturnData:
 
     web_data = request_dict['web_data']
     func_name = request_dict['function_name']
+    args = request_dict['args'] if request_dict['args'] is not None else {}
 
-    if request_dict['args'] is None:
-        args = {}
+    if func_name == 'batch':
+        response = await execute_batch(web_data, glob, args.get('operations', []))
     else:
-        args = request_dict['args']
-
-    if func_name == 'remove_def':
-        return await commands.queue.remove_def(web_data, glob, number=args['number'], list_type=args['list_type'])
-    if func_name == 'web_up':
-        return await web_func.move.web_up(web_data, glob, number=args['number'])
-    if func_name == 'web_down':
-        return await web_func.move.web_down(web_data, glob, number=args['number'])
-    if func_name == 'web_top':
-        return await web_func.move.web_top(web_data, glob, number=args['number'])
-    if func_name == 'web_bottom':
-        return await web_func.move.web_bottom(web_data, glob, number=args['number'])
-    if func_name == 'web_duplicate':
-        return await web_func.move.web_duplicate(web_data, glob, number=args['number'])
-
-    if func_name == 'play_def':
-        return await commands.player.play_def(web_data, glob)
-    if func_name == 'stop_def':
-        return await commands.voice.stop_def(web_data, glob)
-    if func_name == 'pause_def':
-        return await commands.voice.pause_def(web_data, glob)
-    if func_name == 'skip_def':
-        return await commands.queue.skip_def(web_data, glob)
-
-    if func_name == 'loop_command_def':
-        return await commands.player.loop_command_def(web_data, glob)
-    if func_name == 'shuffle_def':
-        return await commands.queue.shuffle_def(web_data, glob)
-    if func_name == 'clear_def':
-        return await commands.queue.clear_def(web_data, glob)
-
-    if func_name == 'web_disconnect':
-        return await web_func.voice.web_disconnect(web_data, glob)
-    if func_name == 'web_join':
-        return await web_func.voice.web_join(web_data, glob, form=args['form'])
-
-    if func_name == 'web_queue':
-        return await web_func.queue.web_queue(web_data, glob, video_type=args['video_type'], position=args['position'])
-    if func_name == 'queue_command_def':
-        return await commands.queue.queue_command_def(web_data, glob, url=args['url'])
-    if func_name == 'web_queue_from_radio':
-        return await web_func.queue.web_queue_from_radio(web_data, glob, radio_name=args['radio_name'])
-
-    if func_name == 'new_queue_save':
-        return new_queue_save(glob, web_data.guild_id, save_name=args['save_name'], author_name=args['author_name'], author_id=args['author_id'])
-    if func_name == 'load_queue_save':
-        return load_queue_save(glob, web_data.guild_id, save_name=args['save_name'])
-    if func_name == 'delete_queue_save':
-        return delete_queue_save(glob, web_data.guild_id, save_name=args['save_name'])
-    if func_name == 'rename_queue_save':
-        return rename_queue_save(glob, web_data.guild_id, old_name=args['old_name'], new_name=args['new_name'])
-
-    if func_name == 'volume_command_def':
-        return await commands.voice.volume_command_def(web_data, glob, volume=args['volume'])
-    if func_name == 'set_video_time':
-        return await commands.player.set_video_time(web_data, glob, time_stamp=args['time_stamp'])
+        response = await call_function(web_data, glob, func_name, args)
 
-    # user edit
-    if func_name == 'web_user_options_edit':
-        return await web_func.options.web_user_options_edit(web_data, glob, form=args['form'])
+    # the web renders the result right after the response
+    write_behind.commit_pending(glob)
+    return response
 
-    # admin
-    if func_name == 'web_video_edit':
-        return await web_func.admin.web_video_edit(web_data, glob, form=args['form'])
-    if func_name == 'web_options_edit':
-        return await web_func.admin.web_options_edit(web_data, glob, form=args['form'])
-
-    if func_name == 'web_delete_guild':
-        return await web_func.admin.web_delete_guild(web_data, glob, guild_id=args['guild_id'])
-    if func_name == 'web_disconnect_guild':
-        return asyncio.run_coroutine_threadsafe(web_func.admin.web_disconnect_guild(web_data, glob, args['guild_id']), glob.bot.loop).result()
-        # return await web_disconnect_guild(web_data, guild_id=args['guild_id'])
-    if func_name == 'web_create_invite':
-        return asyncio.run_coroutine_threadsafe(web_func.admin.web_create_invite(web_data, glob, args['guild_id']), glob.bot.loop).result()
-        # return await web_create_invite(web_data, guild_id=args['guild_id'])
-
-    if func_name == 'download_guild':
-        guild_id = args['guild_id']
-        return await commands.chat_export.download_guild(web_data, glob, guild_id)
-    if func_name == 'download_guild_channel':
-        channel_id = args['channel_id']
-        return await commands.chat_export.download_guild_channel(web_data, glob, channel_id)
-
-    # if func_name == 'export_queue':
-    #     guild_id = args['guild_id']
-    #     return await commands.queue.export_queue(web_data, guild_id)
-    # if func_name == 'import_queue':
-    #     guild_id = args['guild_id']
-    #     queue_data = args['queue_data']
-    #     return await commands.queue.import_queue(web_data, queue_data, guild_id)
-
-    return ReturnData(False, f'Unknown function: {func_name}')
+class MemberIdIndex:
+    """
+    Sorted member ids of guilds - guild_id -> [member_id, ...]
+
+    Pages start with a bisect to the cursor instead of going through all members of the guild
+    Built on first use, dropped by the member join / remove events (and rebuilt when the member
+    cache of the guild was not complete yet when it was built)
+    """
+    def __init__(self):
+        self._ids = {}  # guild_id -> (sorted member ids, guild was chunked)
+
+    def get(self, guild_object) -> list:
+        """
+        Returns the sorted member ids of a guild
+        :param guild_object: discord.Guild
+        :return: [int, ...]
+        """
+        entry = self._ids.get(guild_object.id)
+        if entry is None or (not entry[1] and guild_object.chunked):
+            entry = (sorted(member.id for member in guild_object.members), guild_object.chunked)
+            self._ids[guild_object.id] = entry
+        return entry[0]
+
+    def invalidate(self, guild_id: int) -> None:
+        self._ids.pop(guild_id, None)
+
+member_id_index = MemberIdIndex()
+
+def member_page(glob: GlobalVars, guild_object, cursor: int, limit: int, fields=None, role_id: int = None) -> dict:
+    """
+    Returns one page of members ordered by id
+    Only the members of the page are converted, so the page does not depend on the size of the guild
+    and stays consistent when members join or leave between pages
+    :param glob: GlobalVars
+    :param guild_object: discord.Guild
+    :param cursor: int - id of the last member of the previous page (0 = first page)
+    :param limit: int - max number of members
+    :param fields: [str, ...] - fields of DiscordMember to load (None = all)
+    :param role_id: int - only members with this role (None = all members)
+    :return: {'members': [DiscordMember, ...], 'roles': {role_id: DiscordRole} - roles of the members, 'next_cursor': int or None}
+    """
+    limit = max(1, min(limit, MEMBER_PAGE_MAX))
+    member_ids = member_id_index.get(guild_object)
+
+    page = []
+    for member_id in itertools.islice(member_ids, bisect.bisect_right(member_ids, cursor), None):
+        member = guild_object.get_member(member_id)
+        if member is None or (role_id is not None and member.get_role(role_id) is None):
+            continue
+        page.append(member)
+        if len(page) > limit:
+            break
+
+    next_cursor = page[limit - 1].id if len(page) > limit else None
+    page_members = [DiscordMember(glob, member, fields) for member in page[:limit]]
+    role_ids = (role_id for member in page_members if member.role_ids for role_id in member.role_ids)
+    return {'members': page_members,
+            'roles': guild_role_table(glob, guild_object.id, role_ids),
+            'next_cursor': next_cursor}
 
 async def execute_get_data(request_dict, glob: GlobalVars):
     data_type = request_dict['data_type']
@@ -250,6 +358,12 @@ async def execute_get_data(request_dict, glob: GlobalVars):
         for index, member in enumerate(guild_object.members[start_index:end_index]):
             guild_users.append(DiscordMember(glob, member))
         return guild_users
+    elif data_type == 'guild_members_page':
+        guild_id = request_dict['guild_id']
+        guild_object = glob.bot.get_guild(guild_id)
+        if not guild_object:
+            return None
+        return member_page(glob, guild_object, request_dict.get('cursor', 0), request_dict['limit'], request_dict.get('fields'))
 
     # Guild roles
     elif data_type == 'guild_roles':
@@ -285,6 +399,16 @@ async def execute_get_data(request_dict, glob: GlobalVars):
         for member in role_object.members:
             guild_users.append(DiscordMember(glob, member))
         return guild_users
+    elif data_type == 'guild_role_members_page':
+        guild_id = request_dict['guild_id']
+        role_id = request_dict['role_id']
+        guild_object = glob.bot.get_guild(guild_id)
+        if not guild_object:
+            return None
+        if not guild_object.get_role(role_id):
+            return None
+        # filtered while the page is collected - role.members would build the whole list first
+        return member_page(glob, guild_object, request_dict.get('cursor', 0), request_dict['limit'], request_dict.get('fields'), role_id=role_id)
     elif data_type == 'guild_role_permissions':
         guild_id = request_dict['guild_id']
         role_id = request_dict['role_id']
@@ -324,7 +448,9 @@ async def execute_get_data(request_dict, glob: GlobalVars):
         return DiscordUser(glob, user_id)
 
     # Video
-    if data_type == 'renew':
+    if data_type == 'radio_watch':
+        radio_refresher.watch(glob, request_dict['radio_name'])
+    elif data_type == 'renew':
         queue_type = request_dict['queue_type']
         index = request_dict['index']
         guild_id = request_dict['guild_id']
@@ -352,44 +478,212 @@ async def execute_get_data(request_dict, glob: GlobalVars):
         return guilds_status
     elif data_type == 'guild_bot_status':
         return get_guild_bot_status(glob, request_dict['guild_id'])
+    elif data_type == 'cache_stats':
+        return {'video_info': video_info_store.stats(),
+                'stream_cache': stream_cache.stats(),
+                'extraction_pool': extraction_pool.stats()}
     else:
         print(f'Unknown data type: {data_type}', file=sys.stderr, flush=True)
 
-# handle client
-async def handle_client(client, glob: GlobalVars):
-    request_data = await recv_msg(client)
-    request_dict = pickle.loads(request_data)
+async def serve_subscriber(client):
+    """
+    Sends guild updates to the subscribed web process until it disconnects
+    :param client: socket
+    """
+    queue = update_bus.subscribe()
+    log(None, 'IPC update subscriber connected')
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=UPDATE_KEEPALIVE)
+            except asyncio.TimeoutError:
+                event = {'type': 'ping'}
+            await send_msg(client, encode(event))
+    except OSError:
+        pass
+    finally:
+        update_bus.unsubscribe(queue)
+        client.close()
+        log(None, 'IPC update subscriber disconnected')
+
+def request_guild_id(request_dict: dict) -> int or None:
+    """
+    Returns ID of the guild the request works with (requests of one guild are processed in order)
+    :param request_dict: A request dict
+    :return: int or None
+    """
+    if request_dict.get('guild_id') is not None:
+        return int(request_dict['guild_id'])
+
+    web_data = request_dict.get('web_data')
+    if web_data is not None and getattr(web_data, 'guild_id', None) is not None:
+        return int(web_data.guild_id)
+
+    return None
 
+async def process_request(request_dict: dict, glob: GlobalVars):
+    """
+    Executes a request dict
+    :param request_dict: A request dict
+    :param glob: GlobalVars
+    :return: response
+    """
     request_type = request_dict['type']
 
     if request_type == 'get_data':
-        response = await execute_get_data(request_dict, glob)
+        return await execute_get_data(request_dict, glob)
     elif request_type == 'function':
-        response = await execute_function(request_dict, glob)
+        return await execute_function(request_dict, glob)
     else:
         raise ValueError(f'Unknown request type: {request_type}')
 
-    if response:
-        # serialize response
-        serialized_response = pickle.dumps(response)
-        await send_msg(client, serialized_response)
+# guild_id -> [asyncio.Lock, number of requests holding or waiting for it]
+# (FIFO, keeps the order of requests of one guild), removed when no request uses it
+guild_locks = {}
+# tasks have to be referenced until they finish
+background_tasks = set()
+
+@asynccontextmanager
+async def guild_lock(guild_id: int):
+    """
+    Holds the request lock of a guild
+    :param guild_id: ID of the guild
+    """
+    entry = guild_locks.setdefault(guild_id, [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del guild_locks[guild_id]
+
+def create_background_task(coroutine) -> asyncio.Task:
+    task = asyncio.get_event_loop().create_task(coroutine)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+async def handle_request(client, write_lock: asyncio.Lock, semaphore: asyncio.Semaphore, request_id: int, request_dict: dict, glob: GlobalVars):
+    """
+    Processes one request of a multiplexed connection and sends back the response with its request_id
+    :param client: socket
+    :param write_lock: lock of the connection (one message is written at a time)
+    :param semaphore: limit of requests in flight (released when done)
+    :param request_id: ID of the request on the connection
+    :param request_dict: A request dict
+    :param glob: GlobalVars
+    """
+    try:
+        guild_id = request_guild_id(request_dict)
+        if guild_id is None:
+            response = await process_request(request_dict, glob)
+        else:
+            async with guild_lock(guild_id):
+                response = await process_request(request_dict, glob)
+    except Exception as e:
+        log(None, f'IPC request failed: {request_dict.get("type")} -> {e}', log_type='error')
+        response = None
+    finally:
+        semaphore.release()
+
+    try:
+        serialized_response = encode({'request_id': request_id, 'response': response})
+    except Exception as e:
+        log(None, f'IPC response could not be serialized: {e}', log_type='error')
+        serialized_response = encode({'request_id': request_id, 'response': None})
+
+    try:
+        async with write_lock:
+            await send_msg(client, serialized_response)
+    except OSError:
+        pass
+
+def decode_request(client, request_data) -> dict or None:
+    """
+    Decodes a request message, a message that can not be decoded ends the connection
+    (the request_id of a multiplexed request is not known, so there is no one to answer)
+    :param client: socket
+    :param request_data: message from recv_msg or None
+    :return: dict - request or None when the connection should be closed
+    """
+    if request_data is None:
+        return None
+    try:
+        request_dict = decode(request_data)
+    except DecodeError as e:
+        log(None, f'IPC message could not be decoded, closing connection {client.fileno()}: {e}', log_type='error')
+        return None
+    if not isinstance(request_dict, dict):
+        log(None, f'IPC message is not a request, closing connection {client.fileno()}', log_type='error')
+        return None
+    return request_dict
+
+# handle client
+async def handle_client(client, glob: GlobalVars, semaphore: asyncio.Semaphore):
+    try:
+        request_data = await recv_msg(client)
+    except OSError:
+        request_data = None
+    request_dict = decode_request(client, request_data)
+    if request_dict is None:
+        client.close()
+        return
+
+    if request_dict.get('type') == 'subscribe':
+        await serve_subscriber(client)
+        return
+
+    if 'request_id' not in request_dict:
+        # one request per connection
+        try:
+            response = await process_request(request_dict, glob)
+
+            if response:
+                # serialize response
+                serialized_response = encode(response)
+                await send_msg(client, serialized_response)
+        except Exception as e:
+            log(None, f'IPC request failed: {request_dict.get("type")} -> {e}', log_type='error')
+        finally:
+            client.close()
+        return
+
+    # multiplexed connection - {'request_id': int, 'request': request dict} until the client disconnects
+    write_lock = asyncio.Lock()
+    while request_dict is not None:
+        if not isinstance(request_dict.get('request'), dict):
+            log(None, f'IPC request {request_dict.get("request_id")} has no request dict, closing connection', log_type='error')
+            break
+
+        # backpressure - stop reading when too many requests are in flight
+        await semaphore.acquire()
+        create_background_task(handle_request(client, write_lock, semaphore, request_dict['request_id'], request_dict['request'], glob))
+
+        try:
+            request_data = await recv_msg(client)
+        except OSError:
+            request_data = None
+        request_dict = decode_request(client, request_data)
 
     client.close()
 
 async def run_server(glob: GlobalVars):
     server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     server.bind((HOST, PORT))
-    server.listen(8)
+    server.listen(IPC_BACKLOG)
     server.setblocking(False)
 
     log(None, f'IPC server is running on {HOST}:{PORT}')
 
     loop = asyncio.get_event_loop()
+    semaphore = asyncio.Semaphore(IPC_MAX_IN_FLIGHT)
 
     ipc = True
     while ipc:
         client, _ = await loop.sock_accept(server)
-        await loop.create_task(handle_client(client, glob))
+        create_background_task(handle_client(client, glob, semaphore))
 
 def ipc_run(glob: GlobalVars):
     loop = asyncio.new_event_loop()
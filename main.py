@@ -10,7 +10,8 @@ from classes.data_classes import WebData
 
 from utils.discord import get_content_of_message
 from utils.log import send_to_admin
-from utils.save import update_guilds
+from utils.save import update_guilds, guild_joined, guild_left, write_behind
+from utils.http import close_all_sessions
 from utils.json import *
 
 from commands.admin import *
@@ -20,7 +21,8 @@ from commands.player import *
 from commands.queue import *
 from commands.voice import *
 
-from ipc.server import ipc_run
+from ipc.server import ipc_run, member_id_index
+from ipc.events import update_bus
 import config
 
 authorized_users = config.AUTHORIZED_USERS
@@ -60,8 +62,14 @@ class Bot(dc_commands.Bot):
         log(None, f'Logged in as:\n{bot.user.name}\n{bot.user.id}')
 
         update_guilds(glob)
+        slowed_user_index.load(glob)
 
-        save_json(glob)
+    async def close(self):
+        # commit changes waiting in the write-behind
+        write_behind.commit(glob)
+        # close pooled http connections of the discord and IPC loops
+        await close_all_sessions()
+        await super().close()
 
     async def on_guild_join(self, guild_object):
         # log
@@ -72,8 +80,7 @@ class Bot(dc_commands.Bot):
         await send_to_admin(glob, log_msg)
 
         # create guild object
-        create_guild(glob, guild_object.id)
-        save_json(glob)
+        guild_joined(glob, guild_object.id)
 
         # get text channels
         text_channels = guild_object.text_channels
@@ -99,10 +106,68 @@ class Bot(dc_commands.Bot):
         # send log to admin
         await send_to_admin(glob, log_msg)
 
-        # update guilds
-        save_json(glob)
+        # mark guild as disconnected
+        guild_left(glob, guild_object.id)
+        member_id_index.invalidate(guild_object.id)
+
+    @staticmethod
+    async def on_guild_update(before, after):
+        # renew guild data (name, icon, channels, ...)
+        db_guild = guild(glob, after.id)
+        if db_guild is not None and db_guild.data is not None:
+            db_guild.data.renew(glob)
+            save_json(glob)
+
+    # invalidate discord data cached by the web process
+    @staticmethod
+    async def on_guild_channel_create(channel):
+        update_bus.invalidate('channels', channel.guild.id)
+
+    @staticmethod
+    async def on_guild_channel_delete(channel):
+        update_bus.invalidate('channels', channel.guild.id)
+
+    @staticmethod
+    async def on_guild_channel_update(before, after):
+        update_bus.invalidate('channels', after.guild.id)
+
+    @staticmethod
+    async def on_guild_role_create(role):
+        update_bus.invalidate('roles', role.guild.id)
+
+    @staticmethod
+    async def on_guild_role_delete(role):
+        update_bus.invalidate('roles', role.guild.id)
+
+    @staticmethod
+    async def on_guild_role_update(before, after):
+        update_bus.invalidate('roles', after.guild.id)
+
+    @staticmethod
+    async def on_member_join(member):
+        member_id_index.invalidate(member.guild.id)
+        update_bus.invalidate('roles', member.guild.id)
+
+    @staticmethod
+    async def on_member_remove(member):
+        member_id_index.invalidate(member.guild.id)
+        update_bus.invalidate('roles', member.guild.id)
+
+    @staticmethod
+    async def on_member_update(before, after):
+        if before.roles != after.roles:
+            update_bus.invalidate('roles', after.guild.id)
+        update_bus.invalidate('user', after.id)
+
+    @staticmethod
+    async def on_user_update(before, after):
+        update_bus.invalidate('user', after.id)
 
     async def on_voice_state_update(self, member, before, after):
+        # channel member counts changed
+        if before.channel != after.channel:
+            update_bus.invalidate('channels', member.guild.id)
+
         # set voice state
         voice_state = member.guild.voice_client
 
@@ -208,6 +273,7 @@ class Bot(dc_commands.Bot):
 
             try:
                 glob.ses.rollback()  # Rollback the session
+                invalidate_guild(glob)
             except Exception as rollback_error:
                 error_traceback = traceback.format_exception(type(error), error, error.__traceback__)
                 error_traceback = ''.join(error_traceback)
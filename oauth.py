@@ -1,7 +1,12 @@
-import requests
+from utils.http import fetch_json, run_sync
 import config
 
 class Oauth:
+    """
+    Discord OAuth2 requests of the web, sent through the shared http session (connections are reused)
+
+    The async methods can be awaited on any loop, the sync ones run them on the background http loop
+    """
     client_id = config.CLIENT_ID
     client_secret = config.CLIENT_SECRET
     redirect_uri = config.REDIRECT_URI
@@ -9,7 +14,7 @@ class Oauth:
     discord_api_endpoint = config.DISCORD_API_ENDPOINT
 
     @staticmethod
-    def get_access_token(code):
+    async def get_access_token_async(code):
         data = {
             'client_id': config.CLIENT_ID,
             'client_secret': config.CLIENT_SECRET,
@@ -20,25 +25,32 @@ class Oauth:
         headers = {
             'Content-Type': 'application/x-www-form-urlencoded'
         }
-        r = requests.post('%s/oauth2/token' % Oauth.discord_api_endpoint, data=data, headers=headers)
-        r.raise_for_status()
-        return r.json()
+        return await fetch_json('POST', '%s/oauth2/token' % Oauth.discord_api_endpoint, data=data, headers=headers)
+
+    @staticmethod
+    async def get_user_async(access_token):
+        return await fetch_json('GET', f"{Oauth.discord_api_endpoint}/users/@me", headers={"authorization": f"Bearer {access_token}"})
+
+    @staticmethod
+    async def get_user_guilds_async(access_token):
+        return await fetch_json('GET', f"{Oauth.discord_api_endpoint}/users/@me/guilds", headers={"authorization": f"Bearer {access_token}"})
+
+    @staticmethod
+    async def get_bot_guilds_async():
+        return await fetch_json('GET', f"{Oauth.discord_api_endpoint}/users/@me/guilds", headers={"authorization": f"Bot {config.BOT_TOKEN}"})
 
+    @staticmethod
+    def get_access_token(code):
+        return run_sync(Oauth.get_access_token_async(code))
 
     @staticmethod
     def get_user(access_token):
-        response = requests.get(url=f"{Oauth.discord_api_endpoint}/users/@me", headers={"authorization": f"Bearer {access_token}"})
-        response.raise_for_status()
-        return response.json()
+        return run_sync(Oauth.get_user_async(access_token))
 
     @staticmethod
     def get_user_guilds(access_token):
-        response = requests.get(url=f"{Oauth.discord_api_endpoint}/users/@me/guilds", headers={"authorization": f"Bearer {access_token}"})
-        response.raise_for_status()
-        return response.json()
+        return run_sync(Oauth.get_user_guilds_async(access_token))
 
     @staticmethod
     def get_bot_guilds():
-        response = requests.get(url=f"{Oauth.discord_api_endpoint}/users/@me/guilds", headers={"authorization": f"Bot {config.BOT_TOKEN}"})
-        response.raise_for_status()
-        return response.json()
+        return run_sync(Oauth.get_bot_guilds_async())
@@ -49,6 +49,21 @@ def convert_duration(duration) -> str or None:
     except (ValueError, TypeError):
         return str(duration)
 
+def duration_to_seconds(duration: str) -> int or None:
+    """
+    Converts duration in HH:MM:SS or MM:SS format to seconds
+    if can't convert returns None
+    :param duration: str - duration in HH:MM:SS format
+    :return: int - duration in sec
+    """
+    try:
+        seconds = 0
+        for part in duration.split(':'):
+            seconds = seconds * 60 + int(part)
+        return seconds
+    except (ValueError, TypeError, AttributeError):
+        return None
+
 def to_bool(text_bool: str) -> bool or None:
     """
     Converts text_bool to bool
@@ -11,6 +11,7 @@ from utils.convert import struct_to_time
 from utils.translate import tg
 from utils.video_time import set_stopped
 from utils.save import save_json, push_update
+import utils.prefetch
 from database.guild import guild, get_radio_info
 
 import discord
@@ -201,8 +202,48 @@ def to_queue(glob: GlobalVars, guild_id: int, video, position: int = None, copy_
         push_update(glob, guild_id)
     save_json(glob)
 
+    # the next video changed
+    if position == 0 or len(guild_object.queue) == 1:
+        utils.prefetch.prefetcher.refresh(glob, guild_id)
+
     return f'[`{video.title}`](<{video.url}>) {tg(guild_id, "added to queue!")} -> [Control Panel]({WEB_URL}/guild/{guild_id}&key={guild_object.data.key})'
 
+def to_queue_bulk(glob: GlobalVars, guild_id: int, videos: list, position: int = None) -> int:
+    """
+    Adds videos to queue in one transaction (does not push update)
+
+    Videos are added in the given order, starting at position
+
+    :param glob: GlobalVars object
+    :param guild_id: id of guild: int
+    :param videos: [Queue object, Queue object, ...]
+    :param position: int - position in queue to add videos
+    :return: int - number of added videos
+    """
+    guild_object = guild(glob, guild_id)
+    was_empty = not guild_object.queue
+    created_at = int(time())
+
+    for video in videos:
+        video.played_duration = [{'start': {'epoch': None, 'time_stamp': None}, 'end': {'epoch': None, 'time_stamp': None}}]
+        video.discord_channel = {"id": None, "name": None}
+        video.stream_url = None
+        video.created_at = created_at
+
+    if position is None:
+        guild_object.queue.extend(videos)
+    else:
+        for offset, video in enumerate(videos):
+            guild_object.queue.insert(position + offset, video)
+
+    save_json(glob)
+
+    # the next video changed
+    if videos and (position == 0 or was_empty):
+        utils.prefetch.prefetcher.refresh(glob, guild_id)
+
+    return len(videos)
+
 def get_content_of_message(glob: GlobalVars, message: discord.Message) -> (str, list or None):
     """
     Returns content of message
@@ -0,0 +1,190 @@
+from utils.log import log
+
+from collections import OrderedDict, deque
+from time import time
+import concurrent.futures
+import threading
+import asyncio
+import yt_dlp
+import os
+
+EXTRACT_WORKERS = int(os.environ.get('EXTRACT_WORKERS', 4))  # global cap of running extractions
+EXTRACT_PER_GUILD = int(os.environ.get('EXTRACT_PER_GUILD', 2))  # max running extractions of one guild
+
+class ExtractionJob:
+    """
+    One yt-dlp extraction waiting in the pool
+    :param guild_id: ID of the guild
+    :param url: url to extract
+    :param prefetch: True if the job was started by utils.prefetch
+    """
+    def __init__(self, guild_id: int, url: str, prefetch: bool=False):
+        self.guild_id = guild_id
+        self.url = url
+        self.prefetch = prefetch
+        self.created_at = time()
+        self.future = concurrent.futures.Future()
+
+class ExtractionPool:
+    """
+    Dedicated thread pool for yt-dlp extractions
+
+    Every guild has its own queue, workers take jobs from the guilds round-robin,
+    so one guild adding a long playlist can not starve the others
+    Every worker thread has its own YoutubeDL instance (it is not thread safe)
+
+    :param ytdl_options: options for yt_dlp.YoutubeDL
+    :param workers: number of worker threads (global concurrency cap)
+    :param per_guild: max number of running extractions of one guild
+    """
+    def __init__(self, ytdl_options: dict, workers: int=EXTRACT_WORKERS, per_guild: int=EXTRACT_PER_GUILD):
+        self.ytdl_options = ytdl_options
+        self.workers = max(1, workers)
+        self.per_guild = max(1, per_guild)
+
+        self._queues = OrderedDict()  # guild_id -> deque[ExtractionJob] (order = round-robin order)
+        self._running = {}  # guild_id -> number of running jobs
+        self._condition = threading.Condition()
+        self._threads = []
+
+        # metrics
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _start_workers(self):
+        if self._threads:
+            return
+
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f'extractor-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _next_job(self) -> ExtractionJob or None:
+        """
+        Pops the next job (round-robin over guilds, skips guilds at their limit)
+        Has to be called with self._condition acquired
+        :return: ExtractionJob or None
+        """
+        for guild_id in list(self._queues.keys()):
+            if self._running.get(guild_id, 0) >= self.per_guild:
+                continue
+
+            jobs = self._queues.pop(guild_id)
+            job = jobs.popleft()
+
+            # guild goes to the end of the round
+            if jobs:
+                self._queues[guild_id] = jobs
+
+            return job
+        return None
+
+    def _worker(self):
+        ytdl = yt_dlp.YoutubeDL(self.ytdl_options)
+
+        while True:
+            with self._condition:
+                job = self._next_job()
+                while job is None:
+                    self._condition.wait()
+                    job = self._next_job()
+
+                if not job.future.set_running_or_notify_cancel():
+                    continue
+
+                wait_time = time() - job.created_at
+                self.total_wait += wait_time
+                self.max_wait = max(self.max_wait, wait_time)
+                self._running[job.guild_id] = self._running.get(job.guild_id, 0) + 1
+
+            try:
+                job.future.set_result(ytdl.extract_info(job.url, download=False))
+                self.completed += 1
+            except Exception as e:
+                job.future.set_exception(e)
+                self.failed += 1
+            finally:
+                with self._condition:
+                    self._running[job.guild_id] -= 1
+                    if not self._running[job.guild_id]:
+                        del self._running[job.guild_id]
+                    self._condition.notify_all()
+
+    def submit(self, guild_id: int, url: str, prefetch: bool=False) -> concurrent.futures.Future:
+        """
+        Adds extraction to the queue of the guild
+        :param guild_id: ID of the guild
+        :param url: url to extract
+        :param prefetch: True if the job is a prefetch of the next video
+        :return: concurrent.futures.Future - result of YoutubeDL.extract_info
+        """
+        job = ExtractionJob(guild_id, url, prefetch=prefetch)
+
+        with self._condition:
+            self._start_workers()
+            self._queues.setdefault(guild_id, deque()).append(job)
+            self._condition.notify()
+
+        return job.future
+
+    async def extract(self, guild_id: int, url: str, prefetch: bool=False) -> dict:
+        """
+        Extracts info of url in the pool
+        Cancelling the awaiting task removes the job from the queue
+        :param guild_id: ID of the guild
+        :param url: url to extract
+        :param prefetch: True if the job is a prefetch of the next video
+        :return: dict - yt-dlp info dict
+        """
+        return await asyncio.wrap_future(self.submit(guild_id, url, prefetch=prefetch))
+
+    def cancel(self, guild_id: int, prefetch: bool=False) -> int:
+        """
+        Cancels waiting extractions of the guild (running ones finish, but nobody waits for them)
+        :param guild_id: ID of the guild
+        :param prefetch: also cancel prefetch jobs
+        :return: int - number of cancelled jobs
+        """
+        with self._condition:
+            jobs = self._queues.pop(guild_id, deque())
+
+            keep = deque(job for job in jobs if job.prefetch and not prefetch)
+            if keep:
+                self._queues[guild_id] = keep
+
+        count = 0
+        for job in jobs:
+            if job.prefetch and not prefetch:
+                continue
+            if job.future.cancel():
+                count += 1
+
+        if count:
+            self.cancelled += count
+            log(guild_id, f'Cancelled {count} waiting extractions')
+
+        return count
+
+    def stats(self) -> dict:
+        """
+        Returns pool metrics
+        :return: dict - {workers, per_guild, running, queued, queue_depth, completed, failed, cancelled, avg_wait, max_wait}
+        """
+        with self._condition:
+            queue_depth = {guild_id: len(jobs) for guild_id, jobs in self._queues.items()}
+            started = self.completed + self.failed + sum(self._running.values())
+
+            return {'workers': self.workers,
+                    'per_guild': self.per_guild,
+                    'running': sum(self._running.values()),
+                    'queued': sum(queue_depth.values()),
+                    'queue_depth': queue_depth,
+                    'completed': self.completed,
+                    'failed': self.failed,
+                    'cancelled': self.cancelled,
+                    'avg_wait': self.total_wait / started if started else 0.0,
+                    'max_wait': self.max_wait}
@@ -0,0 +1,146 @@
+import aiohttp
+import asyncio
+import threading
+import atexit
+
+HTTP_TIMEOUT = 10  # seconds for the whole request
+HTTP_CONNECT_TIMEOUT = 5  # seconds to open the connection
+HTTP_POOL_SIZE = 100  # max open connections per session
+HTTP_PER_HOST_LIMIT = 10  # max open connections to one host per session
+HTTP_CLOSE_TIMEOUT = 5  # seconds to wait for a session of another loop to close
+
+# The bot process runs two event loops (discord + IPC server), aiohttp sessions are bound to one loop
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+# Synchronous callers (flask views) share one loop in a background thread, so they share its session too
+_background_loop = None
+_background_lock = threading.Lock()
+
+def get_session() -> aiohttp.ClientSession:
+    """
+    Returns shared aiohttp session of the running event loop
+    (creates it on first use, connections are kept alive between calls)
+    :return: aiohttp.ClientSession
+    """
+    loop = asyncio.get_running_loop()
+
+    with _sessions_lock:
+        session = _sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit=HTTP_POOL_SIZE, limit_per_host=HTTP_PER_HOST_LIMIT,
+                                            ttl_dns_cache=300)
+            timeout = aiohttp.ClientTimeout(total=HTTP_TIMEOUT, sock_connect=HTTP_CONNECT_TIMEOUT)
+            session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            _sessions[loop] = session
+        return session
+
+async def close_session() -> None:
+    """
+    Closes shared session of the running event loop
+    :return: None
+    """
+    loop = asyncio.get_running_loop()
+
+    with _sessions_lock:
+        session = _sessions.pop(loop, None)
+
+    if session is not None and not session.closed:
+        await session.close()
+
+async def close_all_sessions() -> None:
+    """
+    Closes shared sessions of all event loops (on their own loops)
+    For shutdown of the bot process - its discord and IPC loops both have a session
+    :return: None
+    """
+    current_loop = asyncio.get_running_loop()
+
+    with _sessions_lock:
+        sessions = list(_sessions.items())
+        _sessions.clear()
+
+    for loop, session in sessions:
+        if session.closed:
+            continue
+        if loop is current_loop:
+            await session.close()
+        elif loop.is_running():
+            future = asyncio.run_coroutine_threadsafe(session.close(), loop)
+            try:
+                await asyncio.wait_for(asyncio.wrap_future(future), timeout=HTTP_CLOSE_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
+
+async def fetch_json(method: str, url: str, **kwargs):
+    """
+    Sends a request through the shared session and returns the decoded json response
+    :param method: HTTP method
+    :param url: url
+    :param kwargs: aiohttp request arguments (headers, data, params, ...)
+    :return: decoded json
+    :raises aiohttp.ClientResponseError: on error status
+    """
+    async with get_session().request(method, url, **kwargs) as response:
+        response.raise_for_status()
+        return await response.json(content_type=None)
+
+async def fetch_text(method: str, url: str, **kwargs) -> str:
+    """
+    Sends a request through the shared session and returns the response body
+    :param method: HTTP method
+    :param url: url
+    :param kwargs: aiohttp request arguments (headers, data, params, ...)
+    :return: str
+    :raises aiohttp.ClientResponseError: on error status
+    """
+    async with get_session().request(method, url, **kwargs) as response:
+        response.raise_for_status()
+        return await response.text()
+
+def _run_background_loop(loop: asyncio.AbstractEventLoop) -> None:
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_forever()
+    finally:
+        loop.close()
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    global _background_loop
+
+    with _background_lock:
+        if _background_loop is None or _background_loop.is_closed():
+            _background_loop = asyncio.new_event_loop()
+            threading.Thread(target=_run_background_loop, args=(_background_loop,), name='http-loop', daemon=True).start()
+        return _background_loop
+
+@atexit.register
+def stop_background_loop() -> None:
+    """
+    Closes the session of the background http loop and stops the loop (run at exit,
+    a later run_sync starts a new one)
+    :return: None
+    """
+    global _background_loop
+
+    with _background_lock:
+        loop, _background_loop = _background_loop, None
+    if loop is None or not loop.is_running():
+        return
+
+    try:
+        asyncio.run_coroutine_threadsafe(close_session(), loop).result(timeout=HTTP_CLOSE_TIMEOUT)
+    except Exception:
+        # the loop is stopped anyway
+        pass
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+
+def run_sync(coroutine):
+    """
+    Runs a coroutine on the background http loop and waits for the result
+    For synchronous code, which would otherwise open a new connection (or a new loop) for every request
+    :param coroutine: coroutine using get_session()
+    :return: result of the coroutine
+    """
+    return asyncio.run_coroutine_threadsafe(coroutine, _get_background_loop()).result()
@@ -0,0 +1,158 @@
+from config import PARENT_DIR
+
+from array import array
+import threading
+import mmap
+import re
+import os
+
+LOG_CHUNK_LINES = 100  # lines in one chunk of the log viewer
+LOG_SCAN_LIMIT = 200000  # max lines a filtered search reads in one request
+LOG_TYPES = ('C', 'F', 'W', 'T', 'I', 'E')  # command, function, web, text, ip, error (see utils.log.log)
+
+# "time | C guild_id | ..." -> type, guild_id
+LOG_LINE_PATTERN = re.compile(rb'^[^|]*\| ([A-Z]) (\S+) \|')
+
+class LogFile:
+    """
+    Line index of a log file for reading it from the end
+
+    The index is built lazily backwards from the end of the file (through a memory map)
+    only as far as the requested lines, lines appended later are indexed from the previous end
+    The file is never read as a whole
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mm = None
+        self._reset(None)
+
+    def _reset(self, inode) -> None:
+        self._inode = inode
+        self._size = 0  # indexed bytes
+        self._total = 0  # lines in the indexed bytes
+        self._back = array('q')  # line starts found backwards from the end of the first mapping (newest first)
+        self._new = array('q')  # line starts appended after the first mapping (oldest first)
+
+    def _refresh(self) -> None:
+        # has to be called with self._lock acquired
+        stat = os.stat(self.path)
+        if stat.st_ino != self._inode or stat.st_size < self._size:
+            # new or rotated file
+            self._reset(stat.st_ino)
+
+        if stat.st_size == self._size:
+            return
+
+        if self._mm is not None:
+            self._mm.close()
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mm, old_size, size = self._mm, self._size, len(self._mm)
+
+        if old_size == 0:
+            # count lines once in blocks, starts are found later only when they are needed
+            self._total = 1
+            for position in range(0, size - 1, 1 << 22):
+                self._total += mm[position:min(position + (1 << 22), size - 1)].count(b'\n')
+            self._back.append(mm.rfind(b'\n', 0, size - 1) + 1)
+        else:
+            # every newline in the appended bytes starts a line (except at the end of the file)
+            position = mm.find(b'\n', old_size - 1, size - 1)
+            while position != -1:
+                self._new.append(position + 1)
+                self._total += 1
+                position = mm.find(b'\n', position + 1, size - 1)
+
+        self._size = size
+
+    def _line_start(self, k: int) -> int or None:
+        """
+        Returns start of the k-th line from the end (0 = last line), extends the index if needed
+        """
+        if k < len(self._new):
+            return self._new[-1 - k]
+
+        k -= len(self._new)
+        while len(self._back) <= k:
+            last = self._back[-1]
+            if last == 0:
+                return None
+            self._back.append(self._mm.rfind(b'\n', 0, last - 1) + 1)
+        return self._back[k]
+
+    def _line(self, start: int) -> bytes:
+        end = self._mm.find(b'\n', start, self._size)
+        return self._mm[start:end if end != -1 else self._size]
+
+    def chunk_count(self, lines: int = LOG_CHUNK_LINES) -> int:
+        """
+        Returns number of chunks of the log
+        :param lines: lines in one chunk
+        :return: int
+        """
+        with self._lock:
+            self._refresh()
+            return -(-self._total // lines)
+
+    def chunk(self, index: int, lines: int = LOG_CHUNK_LINES) -> list:
+        """
+        Returns lines of the index-th chunk from the end
+        :param index: chunk number (0 = last lines of the file)
+        :param lines: lines in one chunk
+        :return: [(line: str, line_number: int), ...] - newest first
+        """
+        result = []
+        with self._lock:
+            self._refresh()
+            for k in range(index * lines, min((index + 1) * lines, self._total)):
+                start = self._line_start(k)
+                if start is None:
+                    break
+                result.append((self._line(start).decode('utf-8', errors='replace'), self._total - 1 - k))
+        return result
+
+    def search(self, cursor: int, log_types=None, guild_id: str = None, lines: int = LOG_CHUNK_LINES) -> tuple:
+        """
+        Returns lines matching the filters, going from the end of the log
+        :param cursor: number of lines from the end to start at (0 = last line, next_cursor of the previous call)
+        :param log_types: log types to show (see LOG_TYPES), None = all
+        :param guild_id: guild id (or None/ip for lines without guild) to show, None = all
+        :param lines: max number of lines
+        :return: ([(line: str, line_number: int), ...], next_cursor: int or None)
+        """
+        log_types = {log_type.encode() for log_type in log_types} if log_types else None
+        guild_id = guild_id.encode() if guild_id else None
+
+        result = []
+        with self._lock:
+            self._refresh()
+            k = cursor
+            end = min(self._total, cursor + LOG_SCAN_LIMIT)
+            while k < end and len(result) < lines:
+                start = self._line_start(k)
+                if start is None:
+                    break
+
+                line = self._line(start)
+                match = LOG_LINE_PATTERN.match(line)
+                if match and (log_types is None or match.group(1) in log_types) and (guild_id is None or match.group(2) == guild_id):
+                    result.append((line.decode('utf-8', errors='replace'), self._total - 1 - k))
+                k += 1
+
+            next_cursor = k if k < self._total else None
+        return result, next_cursor
+
+_log_files = {}
+_log_files_lock = threading.Lock()
+
+def log_file(file_name: str) -> LogFile:
+    """
+    Returns the (cached) LogFile of a file in db/log
+    :param file_name: name of the log file
+    :return: LogFile
+    """
+    with _log_files_lock:
+        if file_name not in _log_files:
+            _log_files[file_name] = LogFile(f'{PARENT_DIR}db/log/{file_name}')
+        return _log_files[file_name]
@@ -0,0 +1,137 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from utils.global_vars import GlobalVars
+
+from utils.log import log
+import database.guild as db
+import utils.source
+
+import concurrent.futures
+import threading
+import asyncio
+
+class Prefetcher:
+    """
+    Resolves the stream of the next queue item while the current one is playing
+
+    The work runs on the bot loop, so it can be awaited from both the bot and the IPC loop
+    guild_id -> (queue_id, url, concurrent.futures.Future)
+    """
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _next_video(glob: GlobalVars, guild_id: int, current=None):
+        """
+        Returns the queue item that will be played after current
+        :param glob: GlobalVars
+        :param guild_id: int - id of guild
+        :param current: VideoClass child - currently starting video (still in queue when called from play_def)
+        :return: Queue object or None
+        """
+        db_guild = db.guild(glob, guild_id)
+        if db_guild is None:
+            return None
+
+        for video in db_guild.queue:
+            if current is not None and current.__class__.__name__ == 'Queue' and video.id == current.id:
+                continue
+            return video
+        return None
+
+    async def _prefetch(self, guild_id: int, url: str):
+        """
+        Resolves and probes the stream url (fills utils.source.stream_cache)
+        :param guild_id: int - id of guild
+        :param url: str - youtube video url
+        :return: (stream_url, chapters)
+        """
+        return await utils.source.GetSource.resolve_video(guild_id, url, prefetch=True)
+
+    def start(self, glob: GlobalVars, guild_id: int, current=None) -> None:
+        """
+        Starts prefetching the next queue item
+        Keeps the running job if it already targets the same item
+        :param glob: GlobalVars
+        :param guild_id: int - id of guild
+        :param current: VideoClass child - video that just started playing
+        :return: None
+        """
+        video = self._next_video(glob, guild_id, current)
+
+        with self._lock:
+            job = self._jobs.get(guild_id)
+            if job is not None:
+                queue_id, url, future = job
+                if video is not None and queue_id == video.id and url == video.url:
+                    return
+                future.cancel()
+
+            if video is None or video.class_type != 'Video' or glob.bot is None:
+                self._jobs[guild_id] = (None, None, _done_future())
+                return
+
+            future = asyncio.run_coroutine_threadsafe(self._prefetch(guild_id, video.url), glob.bot.loop)
+            self._jobs[guild_id] = (video.id, video.url, future)
+
+        log(guild_id, f'Prefetching next video: {video.url}')
+
+    def refresh(self, glob: GlobalVars, guild_id: int) -> None:
+        """
+        Redoes the prefetch after the queue was changed (move, shuffle, remove, ...)
+        Does nothing if nothing is playing in the guild
+        :param glob: GlobalVars
+        :param guild_id: int - id of guild
+        :return: None
+        """
+        with self._lock:
+            if guild_id not in self._jobs:
+                return
+
+        now_playing = db.guild(glob, guild_id).now_playing
+        self.start(glob, guild_id, now_playing)
+
+    def cancel(self, guild_id: int) -> None:
+        """
+        Cancels prefetch of guild
+        :param guild_id: int - id of guild
+        :return: None
+        """
+        with self._lock:
+            job = self._jobs.pop(guild_id, None)
+        if job is not None:
+            job[2].cancel()
+
+    async def take(self, guild_id: int, video) -> None:
+        """
+        Waits for the prefetch of video to finish so the stream can be taken from the cache
+        Cancels the job if it was prefetching a different item
+        :param guild_id: int - id of guild
+        :param video: Queue object - video about to be played
+        :return: None
+        """
+        with self._lock:
+            job = self._jobs.pop(guild_id, None)
+        if job is None:
+            return
+
+        queue_id, url, future = job
+        if queue_id != video.id or url != video.url:
+            future.cancel()
+            return
+
+        try:
+            await asyncio.wrap_future(future)
+        except (concurrent.futures.CancelledError, asyncio.CancelledError):
+            pass
+        except Exception as e:
+            log(guild_id, f'Prefetch failed: {url} -> {e}', log_type='error')
+
+def _done_future() -> concurrent.futures.Future:
+    future = concurrent.futures.Future()
+    future.set_result(None)
+    return future
+
+prefetcher = Prefetcher()
@@ -0,0 +1,164 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from utils.global_vars import GlobalVars
+
+from utils.global_vars import radio_dict
+from utils.http import get_session
+from utils.log import log
+import classes.video_class
+import utils.save
+
+from bs4 import BeautifulSoup, SoupStrainer
+from time import time
+import threading
+import asyncio
+
+RADIO_REFRESH_INTERVAL = 10  # seconds between requests for the now playing info of a station
+RADIO_IDLE_TIMEOUT = 120  # seconds without readers after which a station is not refreshed anymore
+
+# only the two divs with the now playing info are parsed
+RADIA_CZ_STRAINER = SoupStrainer('div', attrs={'class': ['interpret-image', 'interpret-info']})
+
+def parse_radia_cz(html: str) -> dict:
+    """
+    Returns now playing info from a radia.cz playlist page
+    :param html: str - page
+    :return: dict - picture, channel_name, title
+    """
+    soup = BeautifulSoup(html, features="lxml", parse_only=RADIA_CZ_STRAINER)
+    image = soup.find('div', attrs={'class': 'interpret-image'})
+    info = soup.find('div', attrs={'class': 'interpret-info'})
+
+    return {'picture': image.find('img')['src'],
+            'channel_name': info.find('div', attrs={'class': 'nazev'}).text.strip(),
+            'title': info.find('div', attrs={'class': 'song'}).text.strip()}
+
+def parse_actve(data: dict) -> dict:
+    """
+    Returns now playing info from an actve json response
+    :param data: dict - response
+    :return: dict - picture, channel_name, title
+    """
+    return {'picture': data['coverBase'],
+            'channel_name': data['artist'],
+            'title': data['title']}
+
+class RadioRefresher:
+    """
+    Keeps now playing info of radio stations up to date
+
+    One background task per station on the bot loop (shared by all guilds playing it),
+    the task runs while the station is read and stops after RADIO_IDLE_TIMEOUT without readers
+    Requests are conditional (ETag / Last-Modified) and the RadioInfo row is changed only when the info changes
+    """
+    def __init__(self):
+        self._stations = {}  # radio_name -> {'last_read', 'task', 'etag', 'last_modified', 'info'}
+        self._lock = threading.Lock()
+
+    def watch(self, glob: GlobalVars, radio_name: str) -> None:
+        """
+        Marks the station as read, starts its refresh task if it is not running
+        :param glob: GlobalVars
+        :param radio_name: name of the radio (key of radio_dict)
+        :return: None
+        """
+        if radio_name not in radio_dict:
+            return
+
+        with self._lock:
+            station = self._stations.setdefault(radio_name, {'last_read': 0, 'task': None, 'etag': None,
+                                                             'last_modified': None, 'info': None})
+            last_read, station['last_read'] = station['last_read'], time()
+
+        if glob.bot is None:
+            # web process - the bot refreshes the station, it is told at most once per RADIO_REFRESH_INTERVAL
+            if time() - last_read >= RADIO_REFRESH_INTERVAL:
+                self._notify_bot(radio_name)
+            return
+
+        loop = glob.bot.loop
+        if not loop.is_running() or loop.is_closed():
+            return
+
+        with self._lock:
+            if station['task'] is not None:
+                return
+            station['task'] = True  # reserved until the task is created on the loop
+
+        asyncio.run_coroutine_threadsafe(self._run(glob, radio_name), loop)
+
+    @staticmethod
+    def _notify_bot(radio_name: str) -> None:
+        # imported here, ipc.flaskapp imports the video classes which import this module
+        import ipc.flaskapp
+        try:
+            ipc.flaskapp.send_arg({'type': 'get_data', 'data_type': 'radio_watch', 'radio_name': radio_name}, get_response=False)
+        except OSError:
+            pass
+
+    def info(self, radio_name: str) -> dict or None:
+        """
+        Returns the last fetched now playing info of the station
+        :param radio_name: name of the radio
+        :return: dict - picture, channel_name, title or None
+        """
+        with self._lock:
+            station = self._stations.get(radio_name)
+            return dict(station['info']) if station and station['info'] else None
+
+    async def _run(self, glob: GlobalVars, radio_name: str) -> None:
+        station = self._stations[radio_name]
+        try:
+            while time() - station['last_read'] < RADIO_IDLE_TIMEOUT:
+                try:
+                    await self._fetch(glob, radio_name, station)
+                except Exception as e:
+                    log(None, f'Radio refresh failed: {radio_name} -> {e}', log_type='error')
+                await asyncio.sleep(RADIO_REFRESH_INTERVAL)
+        finally:
+            with self._lock:
+                station['task'] = None
+
+    async def _fetch(self, glob: GlobalVars, radio_name: str, station: dict) -> None:
+        radio = radio_dict[radio_name]
+
+        headers = {}
+        if station['etag']:
+            headers['If-None-Match'] = station['etag']
+        if station['last_modified']:
+            headers['If-Modified-Since'] = station['last_modified']
+
+        async with get_session().get(radio['url'], headers=headers) as response:
+            if response.status == 304:
+                return
+            response.raise_for_status()
+
+            if radio['type'] == 'radia_cz':
+                info = parse_radia_cz(await response.text())
+            elif radio['type'] == 'actve':
+                info = parse_actve(await response.json(content_type=None))
+            else:
+                raise ValueError("Invalid radio website")
+
+            station['etag'] = response.headers.get('ETag')
+            station['last_modified'] = response.headers.get('Last-Modified')
+
+        with self._lock:
+            changed = info != station['info']
+            station['info'] = info
+
+        if changed:
+            # not through get_radio_info, reading the row would keep the station watched
+            radio_info_class = glob.ses.query(classes.video_class.RadioInfo).filter_by(name=radio_name).first()
+            if radio_info_class is None:
+                # first read of the station came from the web
+                radio_info_class = classes.video_class.RadioInfo(radio_id=radio_dict[radio_name]['id'])
+                glob.ses.add(radio_info_class)
+            radio_info_class.picture = info['picture']
+            radio_info_class.channel_name = info['channel_name']
+            radio_info_class.title = info['title']
+            radio_info_class.last_update = int(time())
+            utils.save.write_behind.mark(glob)
+
+radio_refresher = RadioRefresher()
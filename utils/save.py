@@ -2,20 +2,136 @@ from utils.global_vars import GlobalVars
 
 from utils.log import log
 import database.guild as guild
+import ipc.events
 
 from classes.data_classes import Guild, GuildData
+from contextlib import contextmanager
+from contextvars import ContextVar
 from time import time
+import threading
+import asyncio
+
+SAVE_DELAY = 1.0  # seconds, changes made in this window are committed together
+
+# state of the hold block the current task runs in ({'marked': bool} or None)
+_held = ContextVar('write_behind_hold', default=None)
+
+class WriteBehind:
+    """
+    Coalesces database commits
+
+    Changes are flushed to the database right away (so queries see them),
+    the commit is done once per SAVE_DELAY on the loop that made the change
+    The session is not thread safe - a change is committed on its own thread (the bot loop, the IPC loop
+    or right away in a thread without a loop), it is never handed to another thread
+    Updates of guilds are published to the web after the commit
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._scheduled = {}  # event loop -> asyncio.TimerHandle of its scheduled commit
+        self._updated_guilds = set()
+
+        # metrics
+        self.requests = 0
+        self.commits = 0
+
+    def mark(self, glob: GlobalVars, guild_id: int = None) -> None:
+        """
+        Flushes the session and schedules a commit on the running loop
+        Commits right away when no loop is running in this thread or in the web process
+        :param glob: GlobalVars object
+        :param guild_id: ID of the guild to publish an update for after the commit
+        :return: None
+        """
+        glob.ses.flush()
+        self.requests += 1
+
+        with self._lock:
+            if guild_id is not None:
+                self._updated_guilds.add(guild_id)
+
+        held = _held.get()
+        if held is not None:
+            held['marked'] = True
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        if loop is None or glob.bot is None:
+            self.commit(glob)
+            return
+
+        with self._lock:
+            if loop in self._scheduled:
+                return
+            self._scheduled[loop] = loop.call_later(SAVE_DELAY, self._scheduled_commit, glob, loop)
+
+    def _scheduled_commit(self, glob: GlobalVars, loop: asyncio.AbstractEventLoop) -> None:
+        with self._lock:
+            self._scheduled.pop(loop, None)
+        self.commit(glob)
+
+    @contextmanager
+    def hold(self, glob: GlobalVars):
+        """
+        Delays commits requested by the current task until the end of the block
+        (its changes are committed together), other tasks and the bot loop keep committing
+        :param glob: GlobalVars object
+        """
+        if _held.get() is not None:
+            # nested block, the outer one commits
+            yield
+            return
+
+        held = {'marked': False}
+        token = _held.set(held)
+        try:
+            yield
+        finally:
+            _held.reset(token)
+            if held['marked']:
+                self.mark(glob)
+
+    def commit(self, glob: GlobalVars) -> None:
+        """
+        Commits the session now
+        :param glob: GlobalVars object
+        :return: None
+        """
+        with self._lock:
+            updated_guilds, self._updated_guilds = self._updated_guilds, set()
+
+        glob.ses.commit()
+        self.commits += 1
+
+        for guild_id in updated_guilds:
+            ipc.events.update_bus.publish(glob, guild_id)
+
+    def commit_pending(self, glob: GlobalVars) -> None:
+        """
+        Commits now if a commit is scheduled on the running loop (the web reads its own changes right after the request)
+        :param glob: GlobalVars object
+        :return: None
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            handle = self._scheduled.pop(loop, None)
+        if handle is not None:
+            handle.cancel()
+            self.commit(glob)
+
+write_behind = WriteBehind()
 
 def save_json(glob: GlobalVars):
     """
-    Commits data to the database
-    Updates guilds ( update_guilds() )
+    Saves data to the database (the commit is delayed by up to SAVE_DELAY)
     :param glob: GlobalVars object
     :return: None
     """
-    glob.ses.commit()
-    update_guilds(glob)
-    glob.ses.commit()
+    write_behind.mark(glob)
 
 def update_guilds(glob: GlobalVars):
     """
@@ -57,14 +173,42 @@ def update_guilds(glob: GlobalVars):
         if guild_data_object.last_updated < int(time()) - 3600:
             guild_data_object.renew(glob)
 
+    glob.ses.commit()
 
-        # ses.commit()
-        # ses.query(GuildData).filter(GuildData.id == guild_id).first().renew()
-
-        # db_g_data = ses.query(GuildData).filter(GuildData.id == guild_id).first()
-        # print(db_g_data)
+def guild_joined(glob: GlobalVars, guild_id: int):
+    """
+    Adds guild to the database or marks it as connected
+    :param glob: GlobalVars object
+    :param guild_id: ID of the guild
+    :return: None
+    """
+    guild_object = guild.guild(glob, guild_id)
+    if guild_object is None:
+        guild.create_guild(glob, guild_id)
+        log(None, f'Discovered a New guild: {guild_id} -> Added to Database')
+        return
+
+    if not guild_object.connected:
+        guild_object.connected = True
+        log(None, f'Marked guild as connected: {guild_id} = {guild_object.data.name}')
+    guild_object.data.renew(glob)
+    save_json(glob)
+
+def guild_left(glob: GlobalVars, guild_id: int):
+    """
+    Marks guild as disconnected
+    :param glob: GlobalVars object
+    :param guild_id: ID of the guild
+    :return: None
+    """
+    guild_object = guild.guild(glob, guild_id)
+    if guild_object is None or not guild_object.connected:
+        return
 
+    guild_object.connected = False
+    log(None, f'Guild left: {guild_id} = {guild_object.data.name} -> Marked as disconnected')
+    save_json(glob)
 
 def push_update(glob: GlobalVars, guild_id: int):
-    glob.ses.commit()
     guild.guild(glob, guild_id).options.last_updated = int(time())
+    write_behind.mark(glob, guild_id=guild_id)
@@ -2,12 +2,18 @@ from __future__ import annotations
 from utils.global_vars import GlobalVars
 
 from utils.log import log
-from database.guild import guild
+from utils.url import extract_yt_id
+from utils.http import get_session
+from utils.extractor import ExtractionPool
+import database.guild as db
 
+from collections import OrderedDict
+from time import time
+import threading
 import discord
 import asyncio
-import yt_dlp
-import urllib.request
+import aiohttp
+import re
 
 YTDL_OPTIONS = {
     'format': 'bestaudio/best',
@@ -30,20 +36,215 @@ FFMPEG_OPTIONS = {
     'options': '-vn',
 }
 
-def url_checker(url):
+STREAM_CACHE_SIZE = 512  # max number of resolved videos kept in memory
+STREAM_CACHE_DEFAULT_TTL = 3600  # seconds, used when the stream url has no expire parameter
+STREAM_CACHE_EXPIRE_MARGIN = 300  # seconds, entries are dropped this long before the url actually expires
+
+def get_stream_expire(stream_url: str) -> int or None:
+    """
+    Returns the expire epoch of a googlevideo stream url
+    (?expire=1700000000 or /expire/1700000000/)
+    :param stream_url: str - stream url
+    :return: int - epoch or None if not found
+    """
+    re_search = re.search(r"[?&/]expire[=/](\d+)", stream_url)
+    if re_search is None:
+        return None
+    return int(re_search.group(1))
+
+class StreamCache:
+    """
+    Process-wide LRU cache of resolved stream urls
+    video_id -> (expires_at, stream_url, chapters)
+
+    Entries live until the expire parameter of the stream url (minus a margin)
+    Thread safe - used by the bot loop, the IPC loop and executor threads
+    """
+    def __init__(self, max_size: int=STREAM_CACHE_SIZE, default_ttl: int=STREAM_CACHE_DEFAULT_TTL, expire_margin: int=STREAM_CACHE_EXPIRE_MARGIN):
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self.expire_margin = expire_margin
+
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, video_id: str) -> (str, list or None) or None:
+        """
+        Returns cached (stream_url, chapters) or None
+        :param video_id: str - youtube video id
+        :return: (stream_url, chapters) or None
+        """
+        with self._lock:
+            entry = self._data.get(video_id)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, stream_url, chapters = entry
+            if expires_at <= time():
+                del self._data[video_id]
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(video_id)
+            self.hits += 1
+            return stream_url, chapters
+
+    def put(self, video_id: str, stream_url: str, chapters: list=None) -> None:
+        """
+        Stores resolved stream url
+        TTL is taken from the expire parameter of the url
+        :param video_id: str - youtube video id
+        :param stream_url: str - resolved stream url
+        :param chapters: list - chapters of the video
+        :return: None
+        """
+        expire = get_stream_expire(stream_url)
+        if expire is None:
+            expires_at = time() + self.default_ttl
+        else:
+            expires_at = expire - self.expire_margin
+
+        if expires_at <= time():
+            return
+
+        with self._lock:
+            self._data[video_id] = (expires_at, stream_url, chapters)
+            self._data.move_to_end(video_id)
+
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, video_id: str) -> None:
+        """
+        Removes video from cache (for example when the stream url stops working)
+        :param video_id: str - youtube video id
+        :return: None
+        """
+        with self._lock:
+            self._data.pop(video_id, None)
+
+    def stats(self) -> dict:
+        """
+        Returns cache counters
+        :return: dict - {size, max_size, hits, misses, evictions}
+        """
+        with self._lock:
+            return {'size': len(self._data),
+                    'max_size': self.max_size,
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions}
+
+stream_cache = StreamCache()
+
+URL_CHECK_ATTEMPTS = 10  # how many times is the stream extracted again when the check fails
+URL_CHECK_BACKOFF = 0.25  # seconds, first retry delay (doubles every attempt)
+URL_CHECK_BACKOFF_MAX = 4  # seconds, max retry delay
+URL_CHECK_FAIL_TTL = 30  # seconds, how long is a failed url remembered
+
+failed_urls = {}  # url -> (expires_at, code)
+failed_urls_lock = threading.Lock()
+
+async def url_checker(url) -> (bool, int or Exception):
+    """
+    Checks if stream url is reachable (HEAD request, falls back to GET of the first byte)
+    Failed urls are remembered for URL_CHECK_FAIL_TTL seconds
+    :param url: str - stream url
+    :return: (bool, status code or exception)
+    """
+    with failed_urls_lock:
+        failed = failed_urls.get(url)
+        if failed is not None:
+            if failed[0] > time():
+                return False, failed[1]
+            del failed_urls[url]
+
     try:
-        code = urllib.request.urlopen(url).getcode()
-        if code == 200:
+        session = get_session()
+        async with session.head(url, allow_redirects=True) as response:
+            code = response.status
+
+        # server does not support HEAD
+        if code in [405, 501]:
+            async with session.get(url, headers={'Range': 'bytes=0-0'}, allow_redirects=True) as response:
+                code = response.status
+
+        if code in [200, 206]:
             return True, code
-        return False, code
-    except Exception as e:
-        return False, e
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        code = e
 
-class GetSource(discord.PCMVolumeTransformer):
-    ytdl = yt_dlp.YoutubeDL(YTDL_OPTIONS)
+    with failed_urls_lock:
+        failed_urls[url] = (time() + URL_CHECK_FAIL_TTL, code)
+
+        # drop expired entries so the dict does not grow forever
+        if len(failed_urls) > 1000:
+            now = time()
+            for key in [key for key, value in failed_urls.items() if value[0] <= now]:
+                del failed_urls[key]
 
+    return False, code
+
+extraction_pool = ExtractionPool(YTDL_OPTIONS)
+
+class GetSource(discord.PCMVolumeTransformer):
     def __init__(self, glob: GlobalVars, guild_id: int, source: discord.FFmpegPCMAudio):
-        super().__init__(source, guild(glob, guild_id).options.volume)
+        super().__init__(source, db.guild(glob, guild_id).options.volume)
+
+    @classmethod
+    async def resolve_video(cls, guild_id: int, url: str, attempt: int=0, prefetch: bool=False) -> (str, list or None):
+        """
+        Resolves youtube video url to stream url (uses stream_cache)
+
+        When the stream url is not reachable, the video is extracted again
+        (up to URL_CHECK_ATTEMPTS times with exponential backoff)
+
+        :param guild_id: int
+        :param url: str - youtube video url
+        :param attempt: int - attempt to start counting from
+        :param prefetch: bool - True when resolving the next video in advance (skip does not cancel it)
+
+        :return: (stream_url, chapters)
+        """
+        yt_id = extract_yt_id(url)
+
+        cached = stream_cache.get(yt_id) if yt_id is not None else None
+        if cached is not None:
+            return cached
+
+        while True:
+            chapters = None
+            data = await extraction_pool.extract(guild_id, url, prefetch=prefetch)
+
+            if 'chapters' in data:
+                chapters = data['chapters']
+
+            if 'entries' in data:
+                data = data['entries'][0]
+
+            stream_url = data['url']
+            response, code = await url_checker(stream_url)
+            if response:
+                break
+
+            log(guild_id, f'Failed to get source (Attempt {attempt}) from ({url}): {code} -> {stream_url}', 'error')
+            if attempt >= URL_CHECK_ATTEMPTS - 1:
+                return stream_url, chapters
+
+            await asyncio.sleep(min(URL_CHECK_BACKOFF * 2 ** attempt, URL_CHECK_BACKOFF_MAX))
+            attempt += 1
+
+        if yt_id is not None:
+            stream_cache.put(yt_id, stream_url, chapters)
+
+        return stream_url, chapters
 
     @classmethod
     async def create_source(cls, glob: GlobalVars, guild_id: int, url: str, source_type: str = 'Video', time_stamp: int=None, video_class=None, attempt: int=0):
@@ -71,25 +272,7 @@ class GetSource(discord.PCMVolumeTransformer):
         chapters = None
 
         if source_type == 'Video':
-            org_url = url
-            loop = asyncio.get_event_loop()
-            data = await loop.run_in_executor(None, lambda: cls.ytdl.extract_info(url, download=False))
-
-            if 'chapters' in data:
-                chapters = data['chapters']
-
-            if 'entries' in data:
-                data = data['entries'][0]
-
-            url = data['url']
-            response, code = url_checker(url)
-            if not response:
-                log(guild_id, f'Failed to get source (Attempt {attempt}) from ({org_url}): {code} -> {url}', 'error')
-                if attempt > 9:
-                    pass
-                else:
-                    attempt += 1
-                    return await cls.create_source(glob, guild_id, org_url, source_type, time_stamp, video_class, attempt)
+            url, chapters = await cls.resolve_video(guild_id, url, attempt=attempt)
 
         if source_type == 'SoundCloud':
             track = glob.sc.resolve(url)
@@ -1,10 +1,137 @@
 from utils.global_vars import GlobalVars
 
 from classes.video_class import Queue
+from classes.data_classes import SpotifyMatch
+
+from utils.log import log
+from utils.convert import duration_to_seconds
 
 import youtubesearchpython
+import asyncio
+
+SPOTIFY_MATCH_CONCURRENCY = 8  # max number of youtube searches running at once
+
+def search_youtube(search_query: str) -> dict or None:
+    """
+    Returns the first youtube search result of search_query
+    (blocking - run it in an executor)
+    :param search_query: str - search query
+    :return: dict - youtube search result or None
+    """
+    result = youtubesearchpython.VideosSearch(search_query, limit=1).result()['result']
+    if not result:
+        return None
+    return result[0]
+
+def get_spotify_matches(glob: GlobalVars, spotify_ids: list) -> dict:
+    """
+    Returns cached youtube matches of spotify tracks
+    :param glob: GlobalVars
+    :param spotify_ids: [str, str, ...] - spotify track ids
+    :return: {spotify_id: SpotifyMatch, ...}
+    """
+    spotify_ids = list({spotify_id for spotify_id in spotify_ids if spotify_id is not None})
+    matches = {}
+
+    # sqlite has a limit on the number of query parameters
+    for index in range(0, len(spotify_ids), 500):
+        chunk = spotify_ids[index:index + 500]
+        for match in glob.ses.query(SpotifyMatch).filter(SpotifyMatch.id.in_(chunk)).all():
+            matches[match.id] = match
+
+    return matches
 
-def spotify_to_yt_video(glob: GlobalVars, spotify_url: str, author, guild_id: int):
+async def spotify_tracks_to_yt_video_list(glob: GlobalVars, spotify_tracks: list, author, guild_id: int) -> list:
+    """
+    Matches spotify tracks to youtube videos
+
+    Known tracks are taken from the spotify_matches table,
+    the rest is searched on youtube (SPOTIFY_MATCH_CONCURRENCY searches at once) and saved to the table
+
+    :param glob: GlobalVars
+    :param spotify_tracks: [dict, dict, ...] - spotify track objects (with id, name and artists)
+    :param author: author of command
+    :param guild_id: guild id
+    :return: [VideoClass child, VideoClass child, ...] - in the order of spotify_tracks, unmatched tracks are left out
+    """
+    # local files and removed tracks can have no artists
+    spotify_tracks = [track for track in spotify_tracks if track and track.get('name') and track.get('artists')]
+    matches = get_spotify_matches(glob, [track.get('id') for track in spotify_tracks])
+
+    loop = asyncio.get_event_loop()
+    semaphore = asyncio.Semaphore(SPOTIFY_MATCH_CONCURRENCY)
+
+    async def match_track(spotify_track: dict) -> SpotifyMatch or None:
+        search_query = f"{spotify_track['name']} {spotify_track['artists'][0]['name']}"
+        async with semaphore:
+            try:
+                video = await loop.run_in_executor(None, search_youtube, search_query)
+            except Exception as e:
+                log(guild_id, f'Spotify match failed: {search_query} -> {e}', log_type='error')
+                return None
+
+        if video is None:
+            return None
+
+        return SpotifyMatch(spotify_track.get('id'), video['id'], video['title'], duration_to_seconds(video['duration']),
+                            video['channel']['name'], video['channel']['link'])
+
+    # search every unknown track only once
+    to_search = {}
+    for track in spotify_tracks:
+        key = track.get('id') or f"{track['name']} {track['artists'][0]['name']}"
+        if key not in matches and key not in to_search:
+            to_search[key] = track
+
+    new_matches = []
+    if to_search:
+        results = await asyncio.gather(*[match_track(track) for track in to_search.values()])
+        for key, match in zip(to_search.keys(), results):
+            if match is None:
+                continue
+            matches[key] = match
+            if match.id is not None:
+                new_matches.append(match)
+
+    # plain values - the commit expires the loaded matches, reading them again would be one query per track
+    fields = {key: {'url': f'https://www.youtube.com/watch?v={match.yt_id}',
+                    'title': match.title,
+                    'picture': f'https://img.youtube.com/vi/{match.yt_id}/default.jpg',
+                    'duration': str(match.duration) if match.duration is not None else None,
+                    'channel_name': match.channel_name,
+                    'channel_link': match.channel_link}
+              for key, match in matches.items()}
+
+    if new_matches:
+        for match in new_matches:
+            glob.ses.merge(match)
+        glob.ses.commit()
+
+    video_list = []
+    for track in spotify_tracks:
+        video_fields = fields.get(track.get('id') or f"{track['name']} {track['artists'][0]['name']}")
+        if video_fields is None:
+            continue
+
+        video_list.append(Queue(glob, 'Video', author, guild_id, **video_fields))
+
+    return video_list
+
+def get_all_items(glob: GlobalVars, page: dict) -> list:
+    """
+    Returns items of all pages of a spotify paging object
+    (blocking - run it in an executor)
+    :param glob: GlobalVars
+    :param page: dict - first page
+    :return: [dict, dict, ...]
+    """
+    items = list(page['items'])
+    while page.get('next'):
+        page = glob.sp.next(page)
+        items.extend(page['items'])
+    return items
+
+async def spotify_to_yt_video(glob: GlobalVars, spotify_url: str, author, guild_id: int):
     """
     Converts spotify url to youtube video
     :param glob: GlobalVars
@@ -13,40 +140,24 @@ def spotify_to_yt_video(glob: GlobalVars, spotify_url: str, author, guild_id: in
     :param guild_id: guild id
     :return: VideoClass child object
     """
+    loop = asyncio.get_event_loop()
+
     # noinspection PyBroadException
     try:
         spotify_api = glob.sp
         if not spotify_api:
             raise Exception("Spotify API not initialized")
-        spotify_track = spotify_api.track(spotify_url)
+        spotify_track = await loop.run_in_executor(None, spotify_api.track, spotify_url)
     except Exception:
         return None
 
-    title = spotify_track['name']
-    artist = spotify_track['artists'][0]['name']
-    search_query = f"{title} {artist}"
-
-    custom_search = youtubesearchpython.VideosSearch(search_query, limit=1)
-
-    if not custom_search.result()['result']:
+    video_list = await spotify_tracks_to_yt_video_list(glob, [spotify_track], author, guild_id)
+    if not video_list:
         return None
 
-    custom_result: dict = custom_search.result()
-    video: dict = custom_result['result'][0]
-
-    yt_url = video['link']
-    yt_title = video['title']
-    yt_picture = 'https://img.youtube.com/vi/' + video['id'] + '/default.jpg'
-    yt_duration = video['duration']
-    yt_channel_name = video['channel']['name']
-    yt_channel_link = video['channel']['link']
-
-    video_class = Queue(glob, 'Video', author, guild_id, url=yt_url, title=yt_title, picture=yt_picture, duration=yt_duration,
-                        channel_name=yt_channel_name, channel_link=yt_channel_link)
+    return video_list[0]
 
-    return video_class
-
-def spotify_playlist_to_yt_video_list(glob: GlobalVars, spotify_playlist_url: str, author, guild_id: int) -> list or None:
+async def spotify_playlist_to_yt_video_list(glob: GlobalVars, spotify_playlist_url: str, author, guild_id: int) -> list or None:
     """
     Converts spotify playlist url to list of youtube videos
     :param glob: GlobalVars
@@ -55,47 +166,21 @@ def spotify_playlist_to_yt_video_list(glob: GlobalVars, spotify_playlist_url: st
     :param guild_id: guild id
     :return: [VideoClass child, VideoClass child, ...] or None
     """
+    loop = asyncio.get_event_loop()
+
     # noinspection PyBroadException
     try:
         spotify_api = glob.sp
         if not spotify_api:
             raise Exception("Spotify API not initialized")
-        spotify_playlist = spotify_api.playlist_items(spotify_playlist_url, fields='items.track.name, items.track.artists.name')
+        first_page = await loop.run_in_executor(None, lambda: spotify_api.playlist_items(spotify_playlist_url, fields='next, items.track.id, items.track.name, items.track.artists.name'))
+        items = await loop.run_in_executor(None, get_all_items, glob, first_page)
     except Exception:
         return None
 
-    video_list = []
-
-    for index, item in enumerate(spotify_playlist['items']):
-        spotify_track = item['track']
-
-        title = spotify_track['name']
-        artist = spotify_track['artists'][0]['name']
-        search_query = f"{title} {artist}"
-
-        custom_search = youtubesearchpython.VideosSearch(search_query, limit=1)
-
-        if not custom_search.result()['result']:
-            continue
-
-        custom_result: dict = custom_search.result()
-        video: dict = custom_result['result'][0]
-
-        yt_url = video['link']
-        yt_title = video['title']
-        yt_picture = 'https://img.youtube.com/vi/' + video['id'] + '/default.jpg'
-        yt_duration = video['duration']
-        yt_channel_name = video['channel']['name']
-        yt_channel_link = video['channel']['link']
-
-        video_class = Queue(glob, 'Video', author, guild_id, url=yt_url, title=yt_title, picture=yt_picture, duration=yt_duration,
-                            channel_name=yt_channel_name, channel_link=yt_channel_link)
+    return await spotify_tracks_to_yt_video_list(glob, [item['track'] for item in items], author, guild_id)
 
-        video_list.append(video_class)
-
-    return video_list
-
-def spotify_album_to_yt_video_list(glob: GlobalVars, spotify_album_url: str, author, guild_id: int) -> list or None:
+async def spotify_album_to_yt_video_list(glob: GlobalVars, spotify_album_url: str, author, guild_id: int) -> list or None:
     """
     Converts spotify album url to list of youtube videos
     :param glob: GlobalVars
@@ -104,40 +189,16 @@ def spotify_album_to_yt_video_list(glob: GlobalVars, spotify_album_url: str, aut
     :param guild_id: guild id
     :return: [VideoClass child, VideoClass child, ...] or None
     """
+    loop = asyncio.get_event_loop()
+
     # noinspection PyBroadException
     try:
         spotify_api = glob.sp
         if not spotify_api:
             raise Exception("Spotify API not initialized")
-        spotify_album = spotify_api.album_tracks(spotify_album_url)
+        first_page = await loop.run_in_executor(None, spotify_api.album_tracks, spotify_album_url)
+        items = await loop.run_in_executor(None, get_all_items, glob, first_page)
     except Exception:
         return None
 
-    video_list = []
-
-    for index, spotify_track in enumerate(spotify_album['items']):
-        title = spotify_track['name']
-        artist = spotify_track['artists'][0]['name']
-        search_query = f"{title} {artist}"
-
-        custom_search = youtubesearchpython.VideosSearch(search_query, limit=1)
-
-        if not custom_search.result()['result']:
-            continue
-
-        custom_result: dict = custom_search.result()
-        video: dict = custom_result['result'][0]
-
-        yt_url = video['link']
-        yt_title = video['title']
-        yt_picture = 'https://img.youtube.com/vi/' + video['id'] + '/default.jpg'
-        yt_duration = video['duration']
-        yt_channel_name = video['channel']['name']
-        yt_channel_link = video['channel']['link']
-
-        video_class = Queue(glob, 'Video', author, guild_id, url=yt_url, title=yt_title, picture=yt_picture, duration=yt_duration,
-                            channel_name=yt_channel_name, channel_link=yt_channel_link)
-
-        video_list.append(video_class)
-
-    return video_list
+    return await spotify_tracks_to_yt_video_list(glob, items, author, guild_id)
@@ -1,5 +1,39 @@
 import re
 
+# compiled once at import - every /play, /queue and web url add is classified
+YT_ID_PATTERN = re.compile(r"^(?:https?://|//)?(?:www\.|m\.|.+\.)?(?:youtu\.be/|youtube\.com/(?:embed/|v/|shorts/|feeds/api/videos/|watch\?v=|watch\?.+&v=))([\w-]{11})(?![\w-])")
+URL_PATTERN = re.compile(r"(http|ftp|https)://([\w_-]+(?:\.[\w_-]+)+)([\w.,@?^=%&:/~+#-]*[\w@?^=%&/~+#-])")
+PLAYLIST_ID_PATTERN = re.compile(r"[?&]list=([\w-]+)")
+
+# (substring, url type) checked in order after the youtube types
+URL_SECTIONS = (
+    ('spotify.com/playlist/', 'Spotify Playlist'),
+    ('spotify.com/album/', 'Spotify Album'),
+    ('spotify.com/track/', 'Spotify Track'),
+    ('spotify.com/', 'Spotify URL'),
+    ('soundcloud.com/', 'SoundCloud URL'),
+)
+
+class UrlInfo:
+    """
+    Result of classify_url
+
+    :type url_type: str - see get_url_type
+    :type url: str - extracted url (or the input string)
+    :type yt_id: str - youtube video id of url or None
+    :type playlist_id: str - youtube playlist id (list= parameter) or None
+    """
+    __slots__ = ('url_type', 'url', 'yt_id', 'playlist_id')
+
+    def __init__(self, url_type: str, url: str, yt_id: str = None, playlist_id: str = None):
+        self.url_type = url_type
+        self.url = url
+        self.yt_id = yt_id
+        self.playlist_id = playlist_id
+
+    def __repr__(self):
+        return f'UrlInfo({self.url_type!r}, {self.url!r}, yt_id={self.yt_id!r}, playlist_id={self.playlist_id!r})'
+
 def extract_yt_id(url_string: str) -> str or None:
     """
     Extracts youtube video id from url
@@ -8,9 +42,7 @@ def extract_yt_id(url_string: str) -> str or None:
     :param url_string: str - url
     :return: str - youtube video id
     """
-    magic_regex = "^(?:https?://|//)?(?:www\.|m\.|.+\.)?(?:youtu\.be/|youtube\.com/(?:embed/|v/|shorts/|feeds/api/videos/|watch\?v=|watch\?.+&v=))([\w-]{11})(?![\w-])"
-    regex = re.compile(magic_regex)
-    results = regex.search(url_string)
+    results = YT_ID_PATTERN.search(url_string)
 
     if results is None:
         return None
@@ -52,69 +84,101 @@ def get_first_url(string: str) -> str or None:
     :param string: str - string to search in
     :return: str - url or None
     """
-    re_search = re.search(r"(http|ftp|https)://([\w_-]+(?:\.[\w_-]+)+)([\w.,@?^=%&:/~+#-]*[\w@?^=%&/~+#-])", string)
+    re_search = URL_PATTERN.search(string)
     if re_search is None:
         return None
     return re_search[0]
 
-def get_url_type(string: str):
+def classify_url(string: str) -> UrlInfo:
     """
-    Returns type of url
+    Classifies an input string (url or search query)
+    The string is split into words once and every pattern runs at most once
 
     :param string: str - string to search in
-    :return: ('YouTube Playlist', 'YouTube Playlist Video', 'YouTube Video', 'Spotify Playlist', 'Spotify Album', 'Spotify Track', 'String'), url: str
+    :return: UrlInfo - type (see get_url_type), extracted url, youtube id and playlist id
     """
-    first_url = get_first_url(string)
-    yt_id = extract_yt_id(string)
-
-    if '/playlist?list=' in string and extract_yt_id(string) is None:
-        extracted_url = get_url_of(string, '/playlist?list=')
-        if extracted_url is None:
-            return 'String', string
-        return 'YouTube Playlist', extracted_url
-
-    if any(param in string for param in {'index=', 'list='}) and extract_yt_id(string) is not None:
-        extracted_url = get_url_of(string, 'index=')
-        if extracted_url is None:
-            extracted_url = get_url_of(string, 'list=')
+    words = string.split(' ')
+
+    def url_of(section: str) -> str or None:
+        # first url in the first word containing section (same as get_url_of)
+        for word in words:
+            if section in word:
+                return get_first_url(word)
+        return None
+
+    match = YT_ID_PATTERN.search(string)
+    yt_id = match.group(1) if match is not None else None
+
+    playlist_id = None
+    if 'list=' in string:
+        match = PLAYLIST_ID_PATTERN.search(string)
+        playlist_id = match.group(1) if match is not None else None
+
+    # yt_id is matched on the whole string - the extracted urls are parts of it, so it is not searched again
+    if yt_id is None:
+        if '/playlist?list=' in string:
+            extracted_url = url_of('/playlist?list=')
+            if extracted_url is None:
+                return UrlInfo('String', string)
+            return UrlInfo('YouTube Playlist', extracted_url, None, playlist_id)
+    else:
+        if 'index=' in string or 'list=' in string:
+            extracted_url = url_of('index=') or url_of('list=')
             if extracted_url is None:
-                return 'String', string
-        return 'YouTube Playlist Video', extracted_url
-
-    if yt_id is not None:
-        return 'YouTube Video', string
-
-    if 'spotify.com/playlist/' in string:
-        extracted_url = get_url_of(string, 'spotify.com/playlist/')
-        if extracted_url is None:
-            return 'String', string
-        return 'Spotify Playlist', extracted_url
-
-    if 'spotify.com/album/' in string:
-        extracted_url = get_url_of(string, 'spotify.com/album/')
-        if extracted_url is None:
-            return 'String', string
-        return 'Spotify Album', extracted_url
-
-    if 'spotify.com/track/' in string:
-        extracted_url = get_url_of(string, 'spotify.com/track/')
-        if extracted_url is None:
-            return 'String', string
-        return 'Spotify Track', extracted_url
-
-    if 'spotify.com/' in string:
-        extracted_url = get_url_of(string, 'spotify.com/')
-        if extracted_url is None:
-            return 'String', string
-        return 'Spotify URL', extracted_url
-
-    if 'soundcloud.com/' in string:
-        extracted_url = get_url_of(string, 'soundcloud.com/')
-        if extracted_url is None:
-            return 'String', string
-        return 'SoundCloud URL', extracted_url
+                # the parameter is not a part of the url ('...watch?v=ID index=2') - still a youtube video
+                return UrlInfo('String', string, yt_id, playlist_id)
+            return UrlInfo('YouTube Playlist Video', extracted_url, yt_id, playlist_id)
 
+        return UrlInfo('YouTube Video', string, yt_id, playlist_id)
+
+    for section, url_type in URL_SECTIONS:
+        if section in string:
+            extracted_url = url_of(section)
+            if extracted_url is None:
+                return UrlInfo('String', string)
+            return UrlInfo(url_type, extracted_url)
+
+    first_url = get_first_url(string)
     if first_url is not None:
-        return 'String with URL', first_url
+        # the id pattern is anchored at the start, a url after other words is matched only here
+        return UrlInfo('String with URL', first_url, extract_yt_id(first_url))
+
+    return UrlInfo('String', string)
 
-    return 'String', string
+def get_url_type(string: str):
+    """
+    Returns type of url
+
+    :param string: str - string to search in
+    :return: ('YouTube Playlist', 'YouTube Playlist Video', 'YouTube Video', 'Spotify Playlist', 'Spotify Album', 'Spotify Track', 'Spotify URL', 'SoundCloud URL', 'String with URL', 'String'), url: str
+    """
+    url_info = classify_url(string)
+    return url_info.url_type, url_info.url
+
+if __name__ == '__main__':
+    # micro-benchmark: python -m utils.url
+    import timeit
+
+    corpus = [
+        'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+        'https://youtu.be/dQw4w9WgXcQ?si=8fJ2kLq0',
+        'https://m.youtube.com/watch?v=dQw4w9WgXcQ&t=42s',
+        'https://www.youtube.com/shorts/aqz-KE-bpKQ',
+        'https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PLFgquLnL59alCl_2TQvOiD5Vgm1hCaGSI&index=3',
+        'https://www.youtube.com/playlist?list=PLFgquLnL59alCl_2TQvOiD5Vgm1hCaGSI',
+        'https://open.spotify.com/playlist/37i9dQZF1DXcBWIGoYBM5M?si=1a2b3c',
+        'https://open.spotify.com/album/1ATL5GLyefJaxhQzSPVrLX',
+        'https://open.spotify.com/track/4cOdK2wGLETKBW3PvgPWqT?si=abc',
+        'https://soundcloud.com/forss/flickermood',
+        'https://example.com/radio/stream.mp3',
+        'never gonna give you up rick astley',
+        'play this https://youtu.be/dQw4w9WgXcQ please',
+        'https://www.youtube.com/watch?v=dQw4w9WgXcQ index=2',
+    ]
+    number = 10000
+
+    for string in corpus:
+        seconds = timeit.timeit(lambda: classify_url(string), number=number)
+        print(f'{seconds / number * 1e6:8.2f} us  {classify_url(string)}')
+    total = timeit.timeit(lambda: [classify_url(string) for string in corpus], number=number)
+    print(f'{total / number / len(corpus) * 1e6:8.2f} us  average')
@@ -0,0 +1,91 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from utils.global_vars import GlobalVars
+
+from classes.data_classes import VideoInfo
+from utils.url import extract_yt_id
+import utils.save
+
+from time import time
+import threading
+import os
+
+VIDEO_INFO_TTL = int(os.environ.get('VIDEO_INFO_TTL', 7 * 24 * 3600))  # seconds before stored metadata is fetched again
+
+class VideoInfoStore:
+    """
+    Persistent store of youtube video metadata (video_info table)
+
+    Video classes are built from it instead of requesting the video info from youtube,
+    rows older than VIDEO_INFO_TTL are treated as missing and refreshed by the next fetch
+    """
+    def __init__(self, ttl: int = VIDEO_INFO_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+        # metrics
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.stores = 0
+
+    def get(self, glob: GlobalVars, url: str) -> dict or None:
+        """
+        Returns stored fields of a youtube video
+        :param glob: GlobalVars
+        :param url: str - youtube video url
+        :return: dict - title, picture, duration, channel_name, channel_link or None
+        """
+        yt_id = extract_yt_id(url)
+        if yt_id is None:
+            return None
+
+        video_info = glob.ses.get(VideoInfo, yt_id)
+        with self._lock:
+            if video_info is None:
+                self.misses += 1
+                return None
+            if video_info.updated_at is None or video_info.updated_at + self.ttl <= time():
+                self.expired += 1
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        return {'title': video_info.title,
+                'picture': f'https://img.youtube.com/vi/{yt_id}/default.jpg',
+                'duration': video_info.duration,
+                'channel_name': video_info.channel_name,
+                'channel_link': video_info.channel_link}
+
+    def put(self, glob: GlobalVars, url: str, fields: dict) -> None:
+        """
+        Stores fields of a youtube video (commit is left to the write-behind)
+        :param glob: GlobalVars
+        :param url: str - youtube video url
+        :param fields: dict - title, duration, channel_name, channel_link
+        :return: None
+        """
+        yt_id = extract_yt_id(url)
+        if yt_id is None or glob.bot is None:
+            # the web process has a read-only session
+            return
+
+        glob.ses.merge(VideoInfo(yt_id, fields['title'], fields['duration'], fields['channel_name'], fields['channel_link']))
+        utils.save.write_behind.mark(glob)
+        with self._lock:
+            self.stores += 1
+
+    def stats(self) -> dict:
+        """
+        Returns store counters
+        :return: dict - {ttl, hits, misses, expired, stores}
+        """
+        with self._lock:
+            return {'ttl': self.ttl,
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'expired': self.expired,
+                    'stores': self.stores}
+
+video_info_store = VideoInfoStore()
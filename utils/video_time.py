@@ -6,7 +6,8 @@ if TYPE_CHECKING:
 
 import classes.video_class as video_class
 import database.guild as db
-from utils.save import save_json, push_update
+import utils.prefetch
+import utils.save
 
 from time import time
 
@@ -32,7 +33,7 @@ def set_stopped(glob: GlobalVars, video):
             db.guild(glob, guild_id=video.guild_id).now_playing.played_duration = pd
         glob.ses.commit()
 
-    save_json(glob)
+    utils.save.save_json(glob)
 
 def set_started(glob: GlobalVars, video, guild_object, chapters: Union[list[VideoChapter], None]= None):
     """
@@ -62,9 +63,12 @@ def set_started(glob: GlobalVars, video, guild_object, chapters: Union[list[Vide
     guild_id = guild_object.id
     db.guild(glob, guild_id).now_playing = video_class.to_now_playing_class(glob, video)
     glob.ses.commit()
-    push_update(glob, guild_id)
+    utils.save.push_update(glob, guild_id)
 
-    save_json(glob)
+    # start resolving the next video in queue
+    utils.prefetch.prefetcher.start(glob, guild_id, current=video)
+
+    utils.save.save_json(glob)
 
 def set_resumed(glob: GlobalVars, video):
     """
@@ -83,7 +87,7 @@ def set_resumed(glob: GlobalVars, video):
     db.guild(glob, guild_id=video.guild_id).now_playing.played_duration = pd
     glob.ses.commit()
 
-    save_json(glob)
+    utils.save.save_json(glob)
 
 def set_new_time(glob: GlobalVars, video, time_stamp: int):
     """
@@ -106,7 +110,7 @@ def set_new_time(glob: GlobalVars, video, time_stamp: int):
     db.guild(glob, guild_id=video.guild_id).now_playing.played_duration = pd
     glob.ses.commit()
 
-    save_json(glob)
+    utils.save.save_json(glob)
 
 def video_time_from_start(video) -> float:
     len_played_duration = len(video.played_duration)
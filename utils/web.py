@@ -1,6 +1,7 @@
 from utils.global_vars import GlobalVars
 
 from ipc.flaskapp import send_arg
+from ipc.cache import discord_cache
 from config import PARENT_DIR
 import utils.files
 import classes.data_classes
@@ -22,6 +23,27 @@ def execute_function(function_name: str, web_data: classes.data_classes.WebData,
 
     return response
 
+def execute_batch(operations: list, web_data: classes.data_classes.WebData) -> list:
+    """
+    Executes several functions in one request (one round trip, not atomic - see ipc.server.execute_batch)
+    :param operations: [(function_name, kwargs), ...] - executed in order
+    :param web_data: WebData
+    :return: [ReturnData, ...] - result of every operation
+    """
+    # create argument dictionary
+    arg_dict = {
+        'type': 'function',
+        'function_name': 'batch',
+        'web_data': web_data,
+        'args': {'operations': [{'function_name': function_name, 'args': kwargs} for function_name, kwargs in operations]}
+    }
+    response = send_arg(arg_dict)
+
+    if response is None:
+        return [classes.data_classes.ReturnData(False, 'An unexpected error occurred') for _ in operations]
+
+    return response
+
 # Guild
 def get_guild(glob: GlobalVars, guild_id: int):
     """
@@ -80,6 +102,17 @@ def get_guilds_bot_status():
     }
     # send argument dictionary
     return send_arg(arg_dict)
+def get_cache_stats():
+    """
+    Get counters of the bot caches and pools (video info store, stream cache, extraction pool)
+    :return: dict - {cache_name: {counter: value, ...}, ...}
+    """
+    arg_dict = {
+        'type': 'get_data',
+        'data_type': 'cache_stats'
+    }
+    # send argument dictionary
+    return send_arg(arg_dict)
 def get_guild_bot_status(guild_id: int):
     """
     Get the status of the bot in a guild
@@ -108,7 +141,7 @@ def get_guild_voice_channels(guild_id: int):
         'guild_id': guild_id
     }
     # send argument dictionary
-    return send_arg(arg_dict)
+    return discord_cache.get_data(arg_dict, guild_id)
 def get_guild_voice_channels_index(guild_id: int, start_index: int, end_index: int):
     """
     Get the guild channels list from database
@@ -126,7 +159,7 @@ def get_guild_voice_channels_index(guild_id: int, start_index: int, end_index: i
         'end_index': end_index
     }
     # send argument dictionary
-    return send_arg(arg_dict)
+    return discord_cache.get_data(arg_dict, guild_id)
 
 # Guild Text Channels
 def get_guild_text_channels(bot, guild_id: int):
@@ -143,7 +176,7 @@ def get_guild_text_channels(bot, guild_id: int):
         'guild_id': guild_id
     }
     # send argument dictionary
-    response = send_arg(arg_dict)
+    response = discord_cache.get_data(arg_dict, guild_id)
     if response is None:
         return utils.files.get_guild_text_channels_file(bot, guild_id)
     return response
@@ -164,7 +197,7 @@ def get_guild_text_channels_index(guild_id: int, start_index: int, end_index: in
         'end_index': end_index
     }
     # send argument dictionary
-    return send_arg(arg_dict)
+    return discord_cache.get_data(arg_dict, guild_id)
 
 # Channel members
 def get_guild_channel_members(guild_id: int, channel_id: int):
@@ -217,6 +250,26 @@ def get_guild_members_index(guild_id: int, start_index: int, end_index: int):
     }
     # send argument dictionary
     return send_arg(arg_dict)
+def get_guild_members_page(guild_id: int, cursor: int=0, limit: int=25, fields: list=None):
+    """
+    Get one page of the members of a guild (ordered by id)
+    :param guild_id: guild id
+    :param cursor: next_cursor of the previous page (0 = first page)
+    :param limit: max number of members
+    :param fields: list of member fields to load (None = all)
+    :return: dict - {'members': list of members, 'roles': {role_id: role}, 'next_cursor': int or None}
+    """
+    # create argument dictionary
+    arg_dict = {
+        'type': 'get_data',
+        'data_type': 'guild_members_page',
+        'guild_id': guild_id,
+        'cursor': cursor,
+        'limit': limit,
+        'fields': fields
+    }
+    # send argument dictionary
+    return send_arg(arg_dict)
 
 # Guild roles
 def get_guild_roles(guild_id: int):
@@ -232,7 +285,7 @@ def get_guild_roles(guild_id: int):
         'guild_id': guild_id
     }
     # send argument dictionary
-    return send_arg(arg_dict)
+    return discord_cache.get_data(arg_dict, guild_id)
 def get_guild_roles_index(guild_id: int, start_index: int, end_index: int):
     """
     Get the roles of a guild
@@ -250,7 +303,7 @@ def get_guild_roles_index(guild_id: int, start_index: int, end_index: int):
         'end_index': end_index
     }
     # send argument dictionary
-    return send_arg(arg_dict)
+    return discord_cache.get_data(arg_dict, guild_id)
 def get_guild_role_members(guild_id: int, role_id: int):
     """
     Get the members of a guild
@@ -267,6 +320,28 @@ def get_guild_role_members(guild_id: int, role_id: int):
     }
     # send argument dictionary
     return send_arg(arg_dict)
+def get_guild_role_members_page(guild_id: int, role_id: int, cursor: int=0, limit: int=50, fields: list=None):
+    """
+    Get one page of the members of a role (ordered by id)
+    :param guild_id: guild id
+    :param role_id: role id
+    :param cursor: next_cursor of the previous page (0 = first page)
+    :param limit: max number of members
+    :param fields: list of member fields to load (None = all)
+    :return: dict - {'members': list of members, 'roles': {role_id: role}, 'next_cursor': int or None}
+    """
+    # create argument dictionary
+    arg_dict = {
+        'type': 'get_data',
+        'data_type': 'guild_role_members_page',
+        'guild_id': guild_id,
+        'role_id': role_id,
+        'cursor': cursor,
+        'limit': limit,
+        'fields': fields
+    }
+    # send argument dictionary
+    return send_arg(arg_dict)
 def get_guild_role_permissions(guild_id: int, role_id: int):
     """
     Get the permissions of a role
@@ -282,7 +357,7 @@ def get_guild_role_permissions(guild_id: int, role_id: int):
         'role_id': role_id
     }
     # send argument dictionary
-    return send_arg(arg_dict)
+    return discord_cache.get_data(arg_dict, guild_id)
 
 # Guild invites
 def get_guild_invites(guild_id: int):
@@ -401,7 +476,7 @@ def get_username(user_id: int):
         'user_id': user_id
     }
     # send argument dictionary
-    return send_arg(arg_dict)
+    return discord_cache.get_data(arg_dict, user_id)
 def get_user_data(user_id: int):
     """
     Get a user from the database
@@ -415,4 +490,4 @@ def get_user_data(user_id: int):
         'user_id': user_id
     }
     # send argument dictionary
-    return send_arg(arg_dict)
+    return discord_cache.get_data(arg_dict, user_id)
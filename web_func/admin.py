@@ -1,7 +1,7 @@
 from utils.global_vars import GlobalVars
 
 from classes.data_classes import ReturnData, Guild
-from classes.video_class import to_queue_class, to_now_playing_class, to_history_class, Queue
+from classes.video_class import to_queue_class, to_now_playing_class, to_history_class, Queue, fetch_video_data
 
 from utils.log import log, send_to_admin
 from utils.translate import tg
@@ -139,6 +139,18 @@ async def web_video_edit(web_data, glob: GlobalVars, form) -> ReturnData:
         except (TypeError, ValueError, json.decoder.JSONDecodeError, AssertionError, SyntaxError):
             return ReturnData(False, f'Invalid discord channel: {discord_channel}')
 
+    if class_type == 'Video' and url and any(v is None for v in [title, picture, duration, channel_name, channel_link]):
+        # fill the missing fields before the class is created (it does not request them on the loop)
+        try:
+            video_data = await fetch_video_data(glob, url)
+        except ValueError as e:
+            return ReturnData(False, f'Invalid video url: {url} -> {e}')
+        title = title if title is not None else video_data['title']
+        picture = picture if picture is not None else video_data['picture']
+        duration = duration if duration is not None else video_data['duration']
+        channel_name = channel_name if channel_name is not None else video_data['channel_name']
+        channel_link = channel_link if channel_link is not None else video_data['channel_link']
+
     video = Queue(glob, class_type, author, guild_id, url=url, title=title, picture=picture, duration=duration,
                   channel_name=channel_name, channel_link=channel_link, radio_info=radio_info,
                   local_number=local_number, created_at=created_at, played_duration=played_duration, chapters=chapters,
@@ -7,6 +7,7 @@ from utils.log import log
 from utils.translate import tg
 from utils.save import save_json, push_update
 from utils.discord import to_queue
+from utils.prefetch import prefetcher
 from database.guild import guild
 
 from commands.utils import ctx_check
@@ -33,6 +34,7 @@ async def move_def(ctx, glob: GlobalVars, org_number, destination_number, epheme
 
             save_json(glob)
             push_update(glob, guild_id)
+            prefetcher.refresh(glob, guild_id)
 
             message = f"{tg(guild_id, 'Moved')} #{org_number} to #{destination_number} : {video.title}"
             await ctx.reply(message, ephemeral=ephemeral)